@@ -0,0 +1,152 @@
+"""Offline stand-in for the parts of TelegramClient the extractor uses
+
+Channels are synthetic and generated on the fly, so even very large ones
+cost no memory up front. Every request (a page of history, a chunk of a
+download) waits for the configured latency, and downloads can be capped at
+a bandwidth, so throughput numbers behave like a slow network would.
+"""
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from telethon import errors
+from telethon.tl.types import (
+    Channel, ChatPhotoEmpty, Document, DocumentAttributeFilename, InputMessagesFilterDocument,
+    MessageMediaDocument
+)
+
+HISTORY_PAGE_SIZE = 100  # Messages per GetHistory request, as on Telegram
+
+
+class FakeMessage:
+    """The message fields the extractor reads"""
+    __slots__ = ('id', 'date', 'media')
+
+    def __init__(self, message_id, date, media=None):
+        self.id = message_id
+        self.date = date
+        self.media = media
+
+
+class FakeChannel:
+    """A synthetic channel: message_count messages spread evenly between two dates
+
+    pdf_ratio of the messages carry a PDF; of the rest, half carry another
+    kind of document (which the server-side document filter still returns)
+    and half are plain text.
+    """
+
+    def __init__(self, channel_id, title, message_count, pdf_ratio=0.1, size_kb=512,
+                 start=datetime(2024, 1, 1), end=datetime(2024, 3, 31), seed=1):
+        self.entity = Channel(id=channel_id, title=title, photo=ChatPhotoEmpty(), date=None,
+                              access_hash=channel_id * 31)
+        self.message_count = message_count
+        self.pdf_ratio = pdf_ratio
+        self.size_kb = size_kb
+        self.start = start.replace(tzinfo=timezone.utc)
+        self.end = end.replace(tzinfo=timezone.utc) + timedelta(days=1)
+        self.seed = seed
+
+    def message(self, message_id):
+        """Build message #message_id (1 is the oldest); the same id always gives the same message"""
+        rng = random.Random(self.seed * 1000003 + self.entity.id * 7919 + message_id)
+        step = (self.end - self.start) / self.message_count
+        date = self.start + step * (message_id - 1)
+        roll = rng.random()
+        if roll < self.pdf_ratio:
+            name = f"{self.entity.title} {date:%Y-%m-%d} {message_id}.pdf"
+            mime_type = 'application/pdf'
+        elif roll < self.pdf_ratio + (1 - self.pdf_ratio) / 2:
+            name = f"{self.entity.title} {message_id}.zip"
+            mime_type = 'application/zip'
+        else:
+            return FakeMessage(message_id, date)
+        # Sizes vary between half and one and a half times the average
+        size = max(int(self.size_kb * 1024 * rng.uniform(0.5, 1.5)), 1)
+        document = Document(
+            id=self.entity.id * 10 ** 9 + message_id, access_hash=0, file_reference=b'',
+            date=date, mime_type=mime_type, size=size, dc_id=1,
+            attributes=[DocumentAttributeFilename(name)]
+        )
+        return FakeMessage(message_id, date, MessageMediaDocument(document=document))
+
+
+class FakeTelegramClient:
+    """Serves FakeChannels through get_entity, iter_messages and iter_download"""
+
+    def __init__(self, channels, latency=0.02, bandwidth_mbps=None, flood_wait_every=None, flood_wait_seconds=1):
+        self.channels = {channel.entity.title: channel for channel in channels}
+        self.by_id = {channel.entity.id: channel for channel in channels}
+        self.latency = latency
+        self.bandwidth_mbps = bandwidth_mbps  # Per download stream; None for no limit
+        self.flood_wait_every = flood_wait_every  # Answer every Nth request with a FloodWait
+        self.flood_wait_seconds = flood_wait_seconds
+        self.flood_waits = 0
+        self.messages_served = 0
+        self.requests = 0
+        self.bytes_served = 0
+        self.scan_finished = None  # perf_counter() when the last history scan ended
+
+    async def get_entity(self, name):
+        await self._request()
+        if name not in self.channels:
+            raise ValueError(f'No channel named "{name}"')
+        return self.channels[name].entity
+
+    async def iter_messages(self, entity, offset_date=None, offset_id=0, min_id=0, filter=None, **kwargs):
+        """Newest first, older than offset_date and offset_id and newer than min_id, one page per request"""
+        # A looked-up Channel, or the InputPeerChannel a later run builds from its cache
+        channel = self.by_id[getattr(entity, 'channel_id', None) or entity.id]
+        if offset_date is not None and offset_date.tzinfo is None:
+            offset_date = offset_date.replace(tzinfo=timezone.utc)
+        documents_only = isinstance(filter, InputMessagesFilterDocument) or filter is InputMessagesFilterDocument
+        in_page = HISTORY_PAGE_SIZE
+        try:
+            newest = offset_id - 1 if offset_id else channel.message_count
+            for message_id in range(newest, (min_id or 0), -1):
+                message = channel.message(message_id)
+                if offset_date is not None and message.date >= offset_date:
+                    continue
+                if documents_only and message.media is None:
+                    continue
+                if in_page == HISTORY_PAGE_SIZE:
+                    await self._request()
+                    in_page = 0
+                in_page += 1
+                self.messages_served += 1
+                yield message
+        finally:
+            self.scan_finished = time.perf_counter()
+
+    async def iter_download(self, document, offset=0, limit=None, request_size=512 * 1024, file_size=None,
+                            **kwargs):
+        """Yield request_size chunks of zeros, one request each"""
+        # The extractor passes an InputDocumentFileLocation, which has no size of its own
+        size = file_size if file_size is not None else document.size
+        position = offset
+        count = 0
+        while position < size and (limit is None or count < limit):
+            length = min(request_size, size - position)
+            await self._request(length)
+            self.bytes_served += length
+            yield bytes(length)
+            position += length
+            count += 1
+
+    async def _request(self, length=0):
+        """Wait as long as one round trip (plus transfer time, if a bandwidth is set) takes"""
+        self.requests += 1
+        if self.flood_wait_every and self.requests % self.flood_wait_every == 0:
+            self.flood_waits += 1
+            raise errors.FloodWaitError(request=None, capture=self.flood_wait_seconds)
+        delay = self.latency
+        if self.bandwidth_mbps:
+            delay += length / (self.bandwidth_mbps * 1024 * 1024)
+        await asyncio.sleep(delay)
+
+    def is_connected(self):
+        return True
+
+    async def disconnect(self):
+        pass
@@ -0,0 +1,146 @@
+"""Micro-benchmark for filename metadata extraction
+
+Compares the original per-call implementation (kept below as the reference)
+with metadata_engine.MetadataExtractor, checks that both return identical
+(title, date, series) tuples, and prints the time per filename.
+
+    python benchmarks/metadata_extraction.py [--keys 5000] [--files 20000]
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from metadata_engine import MetadataExtractor  # noqa: E402
+
+TODAY = datetime(2024, 6, 1).date()
+
+
+def reference_extract(filename, series_mapping):
+    """The original _extract_metadata_from_filename, minus the print"""
+    name_without_ext = Path(filename).stem
+    title = name_without_ext
+    published_date = None
+    date_match = None
+    date_patterns = [
+        (r'(\d{4}-\d{2}-\d{2})', '%Y-%m-%d'),
+        (r'(\d{4}_\d{2}_\d{2})', '%Y_%m_%d'),
+        (r'(\d{2}-\d{2}-\d{4})', '%d-%m-%Y'),
+        (r'(\d{2}_\d{2}_\d{4})', '%d_%m_%Y'),
+        (r'(\d{4}-\d{2})', '%Y-%m'),
+        (r'(\d{4}_\d{2})', '%Y_%m'),
+        (r'(\d{4})', '%Y'),
+    ]
+    for pattern, date_format in date_patterns:
+        match = re.search(pattern, name_without_ext)
+        if match:
+            date_str = match.group(1)
+            date_match = match
+            try:
+                if date_format == '%Y-%m' or date_format == '%Y_%m':
+                    parsed_date = datetime.strptime(date_str, date_format)
+                    published_date = parsed_date.replace(day=1).date()
+                elif date_format == '%Y':
+                    parsed_date = datetime.strptime(date_str, date_format)
+                    published_date = parsed_date.replace(month=1, day=1).date()
+                else:
+                    published_date = datetime.strptime(date_str, date_format).date()
+                break
+            except ValueError:
+                continue
+    if not published_date:
+        published_date = TODAY
+
+    series = None
+    for key, series_name in series_mapping.items():
+        if key.lower() in filename.lower():
+            series = series_name
+            break
+    if not series and date_match:
+        before_date = name_without_ext[:date_match.start()].strip()
+        before_date = before_date.rstrip('-_. ')
+        if before_date:
+            series = before_date
+    elif not series:
+        clean_name = name_without_ext
+        for suffix in ['_document', '_doc', '_file', '_pdf']:
+            if clean_name.lower().endswith(suffix):
+                clean_name = clean_name[:-len(suffix)]
+                break
+        if clean_name and clean_name != name_without_ext:
+            series = clean_name
+    return title, published_date, series
+
+
+def build_mapping(key_count, rng):
+    """series_mapping.json plus synthetic magazine names up to key_count keys"""
+    mapping_file = Path(__file__).resolve().parent.parent / 'series_mapping.json'
+    mapping = json.loads(mapping_file.read_text(encoding='utf-8')) if mapping_file.exists() else {}
+    words = ['Weekly', 'Monthly', 'Review', 'Times', 'Journal', 'Digest', 'Post', 'Herald',
+             'Tech', 'Money', 'Science', 'Home', 'Garden', 'Auto', 'Travel', 'Food']
+    while len(mapping) < key_count:
+        name = f"{rng.choice(words)} {rng.choice(words)} {len(mapping)}"
+        mapping[name] = name.title()
+    return mapping
+
+
+def build_filenames(file_count, mapping, rng):
+    """Filenames in the shapes seen in the channels, mapped and unmapped"""
+    keys = list(mapping.keys())
+    shapes = [
+        lambda k: f"{k} {rng.randint(2015, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}.pdf",
+        lambda k: f"{k}_{rng.randint(1, 28):02d}_{rng.randint(1, 12):02d}_{rng.randint(2015, 2025)}.pdf",
+        lambda k: f"{k}-{rng.randint(2015, 2025)}-{rng.randint(1, 12):02d}.pdf",
+        lambda k: f"{k} {rng.randint(2015, 2025)}.pdf",
+        lambda k: f"Unmapped Magazine {rng.randint(2015, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}.pdf",
+        lambda k: f"Scan-2024-13-45 {rng.randint(1, 99)}.pdf",  # Unparseable full date
+        lambda k: "report_document.pdf",  # No date at all; the same name repeats, as reposts do
+        lambda k: f"untitled {rng.randint(1, 999)}.pdf",
+    ]
+    return [rng.choice(shapes)(rng.choice(keys) if keys else 'x') for _ in range(file_count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--keys', type=int, default=2000, help='series_mapping size')
+    parser.add_argument('--files', type=int, default=5000, help='number of filenames')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    mapping = build_mapping(args.keys, rng)
+    filenames = build_filenames(args.files, mapping, rng)
+
+    start = time.perf_counter()
+    expected = [reference_extract(filename, mapping) for filename in filenames]
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    extractor = MetadataExtractor(mapping)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = extractor.extract_many(filenames, default_date=TODAY)
+    engine_time = time.perf_counter() - start
+
+    mismatches = [(f, e, a) for f, e, a in zip(filenames, expected, actual) if e != a]
+    print(f"{len(mapping)} mapping keys, {len(filenames)} filenames")
+    print(f"  reference: {reference_time * 1e6 / len(filenames):8.1f} µs/file")
+    print(f"  engine:    {engine_time * 1e6 / len(filenames):8.1f} µs/file "
+          f"(+{build_time * 1000:.1f}ms to build the matcher)")
+    print(f"  speedup:   {reference_time / engine_time:8.1f}x")
+    if mismatches:
+        print(f"  ✗ {len(mismatches)} results differ, first: {mismatches[0]}")
+        return 1
+    print("  ✓ identical results")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,264 @@
+"""Offline throughput benchmark for the Telegram and folder import pipelines
+
+Runs TelegramPDFExtractor.extract_pdfs against synthetic channels served by
+fake_telegram.FakeTelegramClient, and PDFFolderImporter against a generated
+folder of PDFs, with Calibre imports going to stub_calibredb.py. Nothing
+touches the network or a real library, so runs on different commits of the
+same machine can be compared.
+
+    python benchmarks/pipeline.py [--channels 2] [--messages 2000] [--pdf-ratio 0.1]
+        [--size-kb 512] [--latency-ms 20] [--calibre-delay-ms 50] [--lock-rate 0.02]
+        [--folder-files 500] [--json results.json] [--min-mb-per-sec 100]
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import stat
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+from fake_telegram import FakeChannel, FakeTelegramClient  # noqa: E402
+from folder_importer import PDFFolderImporter  # noqa: E402
+from main import ChannelJob, TelegramPDFExtractor  # noqa: E402
+
+START_DATE = datetime(2024, 1, 1)
+END_DATE = datetime(2024, 3, 31)
+
+
+def make_stub_calibre(bin_dir):
+    """Write calibredb and calibre-debug wrappers around stub_calibredb.py; returns the calibredb path"""
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    for name in ('calibredb', 'calibre-debug'):
+        wrapper = bin_dir / name
+        wrapper.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{BENCH_DIR / "stub_calibredb.py"}" "$@"\n')
+        wrapper.chmod(wrapper.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return str(bin_dir / 'calibredb')
+
+
+def count_imports(library_path):
+    """Books the stub recorded as added"""
+    log_path = Path(library_path) / 'stub_calibredb.log'
+    if not log_path.exists():
+        return 0
+    with open(log_path) as f:
+        return sum(1 for _ in f)
+
+
+@contextlib.contextmanager
+def measured(result, args):
+    """Time the block, track its Python heap peak and silence the pipeline's own output"""
+    if args.trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    output = sys.stdout if args.verbose else open(os.devnull, 'w')
+    try:
+        with contextlib.redirect_stdout(output):
+            yield start
+    finally:
+        result['seconds'] = time.perf_counter() - start
+        if args.trace_memory:
+            result['peak_heap_mb'] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.stop()
+        if output is not sys.stdout:
+            output.close()
+
+
+def configure_calibre(importer, args, workdir, calibredb, name):
+    """Point an importer at the stub calibredb and a throwaway library"""
+    importer.enable_calibre_import = args.calibre
+    importer.calibre_cli_path = calibredb
+    importer.calibre_library_path = str(workdir / name)
+    importer.calibre_batch_size = args.batch_size
+    importer.skip_existing_in_library = False
+    return importer.calibre_library_path
+
+
+def bench_telegram(args, workdir, calibredb):
+    """Download every PDF of the synthetic channels and import them"""
+    channels = [
+        FakeChannel(index + 1, f"bench{index + 1}", args.messages, args.pdf_ratio, args.size_kb,
+                    START_DATE, END_DATE, seed=args.seed)
+        for index in range(args.channels)
+    ]
+    client = FakeTelegramClient(channels, latency=args.latency_ms / 1000, bandwidth_mbps=args.bandwidth,
+                                flood_wait_every=args.flood_wait_every)
+
+    extractor = TelegramPDFExtractor()
+    extractor.client = client
+    extractor.start_date = START_DATE
+    extractor.end_date = END_DATE
+    extractor.sync_ledger_path = str(workdir / 'sync_ledger.db')
+    extractor.download_workers = args.download_workers
+    extractor.calibre_import_workers = args.import_workers
+    library_path = configure_calibre(extractor, args, workdir, calibredb, 'library-telegram')
+    extractor.channels = [
+        ChannelJob(channel.entity.title, START_DATE, END_DATE, workdir / 'downloads' / channel.entity.title,
+                   tag=f"{channel.entity.title} " if len(channels) > 1 else '')
+        for channel in channels
+    ]
+
+    result = {}
+    with measured(result, args) as start:
+        asyncio.get_event_loop().run_until_complete(extractor.extract_pdfs())
+    extractor.ledger.close()
+
+    scan_seconds = (client.scan_finished or start) - start
+    result.update({
+        'messages_scanned': client.messages_served,
+        'flood_waits': client.flood_waits,
+        'scan_seconds': scan_seconds,
+        'messages_per_sec': client.messages_served / scan_seconds if scan_seconds > 0 else 0.0,
+        'pdfs': sum(job.progress.downloaded for job in extractor.channels if job.progress),
+        'mb_downloaded': client.bytes_served / (1024 * 1024),
+        'imports': count_imports(library_path),
+        'run_metrics': extractor.metrics.snapshot(),
+    })
+    result['mb_per_sec'] = result['mb_downloaded'] / result['seconds']
+    result['imports_per_sec'] = result['imports'] / result['seconds']
+    return result
+
+
+def bench_folder(args, workdir, calibredb):
+    """Import a generated folder of PDFs, 100 per subfolder"""
+    source = workdir / 'source'
+    padding = bytes(args.folder_size_kb * 1024)
+    for index in range(args.folder_files):
+        folder = source / f"{index // 100:04d}"
+        folder.mkdir(parents=True, exist_ok=True)
+        (folder / f"Bench Weekly {2015 + index % 10}-{index % 12 + 1:02d}-{index % 28 + 1:02d} {index}.pdf") \
+            .write_bytes(b'%PDF-1.4\n' + padding)
+
+    importer = PDFFolderImporter()
+    importer.source_folder = str(source)
+    importer.recursive = True
+    importer.import_workers = args.import_workers
+    importer.scan_cache_path = str(workdir / 'folder_scan_cache.db')
+    library_path = configure_calibre(importer, args, workdir, calibredb, 'library-folder')
+
+    result = {}
+    with measured(result, args):
+        importer.import_pdfs()
+    if importer.scan_cache:
+        importer.scan_cache.close()
+
+    result.update({
+        'files': args.folder_files,
+        'files_per_sec': args.folder_files / result['seconds'],
+        'imports': count_imports(library_path),
+        'run_metrics': importer.metrics.snapshot(),
+    })
+    result['imports_per_sec'] = result['imports'] / result['seconds']
+    return result
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process, or None where getrusage is unavailable"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _memory_text(result):
+    """Report suffix with the peak heap, if tracemalloc ran"""
+    return f", peak heap {result['peak_heap_mb']:.1f}MB" if 'peak_heap_mb' in result else ''
+
+
+def print_report(args, results):
+    calibre = f"calibredb {args.calibre_delay_ms}ms/call, {args.lock_rate:.0%} locked" if args.calibre \
+        else "Calibre import off"
+
+    telegram = results.get('telegram')
+    if telegram:
+        print(f"Telegram pipeline: {args.channels} channels x {args.messages} messages, "
+              f"{args.pdf_ratio:.0%} PDFs of ~{args.size_kb}KB, {args.latency_ms}ms latency, {calibre}")
+        counters = telegram['run_metrics']['counters']
+        record_text = ''
+        if counters.get('pdf_record_bytes'):
+            record_text = f", ~{counters['pdf_record_bytes']} bytes per queued PDF"
+        print(f"  scan:     {telegram['messages_scanned']} messages in {telegram['scan_seconds']:.1f}s "
+              f"({telegram['messages_per_sec']:.0f} messages/sec){record_text}")
+        print(f"  download: {telegram['pdfs']} PDFs, {telegram['mb_downloaded']:.1f}MB in {telegram['seconds']:.1f}s "
+              f"({telegram['mb_per_sec']:.2f}MB/s)"
+              + (f", {telegram['flood_waits']} FloodWaits" if telegram['flood_waits'] else ''))
+        print(f"  import:   {telegram['imports']} books ({telegram['imports_per_sec']:.2f} imports/sec)"
+              f"{_memory_text(telegram)}")
+
+    folder = results.get('folder')
+    if folder:
+        print(f"Folder importer: {folder['files']} PDFs of {args.folder_size_kb}KB, "
+              f"{args.import_workers} workers, {calibre}")
+        print(f"  process:  {folder['files']} files in {folder['seconds']:.1f}s ({folder['files_per_sec']:.1f} files/sec)")
+        print(f"  import:   {folder['imports']} books ({folder['imports_per_sec']:.2f} imports/sec){_memory_text(folder)}")
+
+    if results.get('peak_rss_mb'):
+        print(f"Process peak RSS: {results['peak_rss_mb']:.1f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stage', choices=['all', 'telegram', 'folder'], default='all')
+    parser.add_argument('--channels', type=int, default=2)
+    parser.add_argument('--messages', type=int, default=2000, help='messages per channel')
+    parser.add_argument('--pdf-ratio', type=float, default=0.1, help='share of messages carrying a PDF')
+    parser.add_argument('--size-kb', type=int, default=512, help='average PDF size')
+    parser.add_argument('--latency-ms', type=int, default=20, help='Telegram round trip per request')
+    parser.add_argument('--bandwidth', type=float, default=None, help='MB/s per download stream (default: no limit)')
+    parser.add_argument('--flood-wait-every', type=int, default=None,
+                        help='answer every Nth Telegram request with a 1s FloodWait')
+    parser.add_argument('--download-workers', type=int, default=4)
+    parser.add_argument('--import-workers', type=int, default=1,
+                        help='CALIBRE_IMPORT_WORKERS for Telegram, IMPORT_WORKERS for the folder importer')
+    parser.add_argument('--batch-size', type=int, default=1, help='CALIBRE_BATCH_SIZE')
+    parser.add_argument('--no-calibre', dest='calibre', action='store_false', help='skip the Calibre import stage')
+    parser.add_argument('--calibre-delay-ms', type=int, default=50, help='time the stub takes per call')
+    parser.add_argument('--lock-rate', type=float, default=0.0, help='share of stub calls failing with a lock')
+    parser.add_argument('--folder-files', type=int, default=500)
+    parser.add_argument('--folder-size-kb', type=int, default=64)
+    parser.add_argument('--no-trace-memory', dest='trace_memory', action='store_false',
+                        help='skip tracemalloc, which slows the run down')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--verbose', action='store_true', help="show the pipelines' own output")
+    parser.add_argument('--json', help='also write the results to this file')
+    parser.add_argument('--min-mb-per-sec', type=float, default=None,
+                        help='exit with an error if the Telegram download rate is lower')
+    args = parser.parse_args()
+
+    os.environ['STUB_CALIBREDB_DELAY'] = str(args.calibre_delay_ms / 1000)
+    os.environ['STUB_CALIBREDB_LOCK_RATE'] = str(args.lock_rate)
+
+    results = {'settings': vars(args)}
+    with tempfile.TemporaryDirectory(prefix='pdf_extractor_bench_') as workdir:
+        workdir = Path(workdir)
+        calibredb = make_stub_calibre(workdir / 'bin')
+        if args.stage in ('all', 'telegram'):
+            results['telegram'] = bench_telegram(args, workdir, calibredb)
+        if args.stage in ('all', 'folder'):
+            results['folder'] = bench_folder(args, workdir, calibredb)
+    results['peak_rss_mb'] = peak_rss_mb()
+
+    print_report(args, results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    telegram = results.get('telegram')
+    if args.min_mb_per_sec and telegram and telegram['mb_per_sec'] < args.min_mb_per_sec:
+        print(f"✗ Downloads ran at {telegram['mb_per_sec']:.2f}MB/s, below --min-mb-per-sec {args.min_mb_per_sec:g}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""Stand-in for calibredb and calibre-debug that only pretends to import
+
+Understands the commands the importers run:
+
+    calibredb add FILE --library-path LIB --title TITLE   -> "Added book ids: N"
+    calibredb set_metadata --library-path LIB ID --field ...
+    calibredb list ...
+    calibre-debug -c SCRIPT                                -> CALIBRE_BATCH_RESULT [...]
+
+Each call sleeps STUB_CALIBREDB_DELAY seconds (default 0.05), like a real
+calibredb starting up and writing metadata.db, and fails with "database is
+locked" for a STUB_CALIBREDB_LOCK_RATE share (default 0) of the calls.
+Successful adds are appended to stub_calibredb.log in the library folder.
+"""
+import ast
+import fcntl
+import json
+import os
+import random
+import sys
+import time
+
+
+def _library_path(args):
+    for option in ('--library-path', '--with-library'):
+        if option in args:
+            return args[args.index(option) + 1]
+    return '.'
+
+
+def _next_book_ids(library_path, lines):
+    """Append the added files to the log and return their book ids"""
+    os.makedirs(library_path, exist_ok=True)
+    with open(os.path.join(library_path, 'stub_calibredb.log'), 'a+') as log:
+        fcntl.flock(log, fcntl.LOCK_EX)  # Several import workers may add at once
+        log.seek(0)
+        first_id = sum(1 for _ in log) + 1
+        for line in lines:
+            log.write(line + '\n')
+    return list(range(first_id, first_id + len(lines)))
+
+
+def main(args):
+    time.sleep(float(os.getenv('STUB_CALIBREDB_DELAY', '0.05')))
+    if random.random() < float(os.getenv('STUB_CALIBREDB_LOCK_RATE', '0')):
+        print("apsw.BusyError: database is locked", file=sys.stderr)
+        return 1
+
+    command = args[0] if args else ''
+    if command == 'add':
+        book_id, = _next_book_ids(_library_path(args), [args[1]])
+        print(f"Added book ids: {book_id}")
+    elif command == '-c':
+        # calibre-debug running the batch script: its first line names the manifest
+        manifest_path = ast.literal_eval(args[1].split('\n', 1)[0].split('=', 1)[1].strip())
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        book_ids = _next_book_ids(manifest['library_path'], [book['path'] for book in manifest['books']])
+        results = [{'status': 'added', 'book_id': book_id} for book_id in book_ids]
+        print('CALIBRE_BATCH_RESULT ' + json.dumps(results))
+    elif command not in ('set_metadata', 'list'):
+        print(f"stub calibredb: unsupported command {command!r}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,251 @@
+import os
+import json
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from calibre_db_writer import CalibreLibraryWriter
+from fs_probe import probe as probe_filesystem
+from run_metrics import RunMetrics
+
+# Runs inside calibre-debug, i.e. with calibre's own Python and library API.
+# All books of a batch are added in one process with title, series and pubdate
+# attached to the add itself, and a result is printed for every file.
+BATCH_SCRIPT = r'''
+import json
+from calibre.library import db as open_library
+from calibre.ebooks.metadata.book.base import Metadata
+from calibre.utils.date import parse_only_date
+
+with open(MANIFEST_PATH, 'r') as f:
+    manifest = json.load(f)
+
+cache = open_library(manifest['library_path']).new_api
+results = []
+for item in manifest['books']:
+    try:
+        mi = Metadata(item['title'])
+        if item.get('series'):
+            mi.series = item['series']
+        if item.get('pubdate'):
+            mi.pubdate = parse_only_date(item['pubdate'])
+        ids, duplicates = cache.add_books([(mi, {'PDF': item['path']})], add_duplicates=False)
+        if ids:
+            results.append({'status': 'added', 'book_id': ids[0]})
+        else:
+            results.append({'status': 'duplicate'})
+    except Exception as e:
+        results.append({'status': 'error', 'error': str(e)})
+
+print('CALIBRE_BATCH_RESULT ' + json.dumps(results))
+'''
+
+# Libraries already warned about falling back from the direct writer
+_unsafe_direct_libraries = set()
+
+
+def calibre_gui_running():
+    """Writing to the library behind calibredb's back is unsafe while Calibre holds it"""
+    import psutil  # Imported here so that starting a run does not pay for it
+    try:
+        for proc in psutil.process_iter(['name']):
+            name = (proc.info['name'] or '').lower()
+            if name in ('calibre', 'calibre.exe', 'calibre-parallel') or name.startswith('calibre-server'):
+                return True
+    except Exception:
+        pass
+    return False
+
+
+class BatchItem:
+    """A PDF waiting to be imported, with the metadata that goes with it"""
+    __slots__ = ('file_path', 'title', 'published_date', 'series', 'key', 'success', 'present')
+
+    def __init__(self, file_path, title, published_date, series, key=None):
+        self.file_path = file_path
+        self.title = title
+        self.published_date = published_date
+        self.series = series
+        self.key = key
+        self.success = None
+        self.present = False  # Skipped because the library already has the book
+
+
+class CalibreBatchImporter:
+    """Collect PDFs and import each batch into Calibre with a single process
+
+    backend 'calibredb' runs the batch through calibre-debug; backend 'direct'
+    writes it straight into metadata.db in one SQLite transaction.
+    """
+
+    def __init__(self, calibre_cli_path, library_path, batch_size=20, fallback=None, max_retries=3,
+                 backend='calibredb', metrics=None, limiter=None):
+        self.calibre_cli_path = calibre_cli_path
+        self.library_path = os.path.expanduser(library_path)
+        self.backend = self._safe_backend(backend)
+        self.batch_size = batch_size
+        self.fallback = fallback  # Per-file import used when batching is not possible
+        self.max_retries = max_retries
+        self.pending = []
+        self.metrics = metrics or RunMetrics('calibre_batch')
+        self.limiter = limiter  # AdaptiveRateLimiter shared with the per-file imports, if any
+        self.lock = threading.Lock()  # add() and flush() may be called from several import threads
+        self.run_lock = threading.Lock()  # One batch at a time writes to the library
+        self.debug_path = os.getenv('CALIBRE_DEBUG_PATH') or str(
+            Path(calibre_cli_path).with_name('calibre-debug')
+        )
+
+    def _safe_backend(self, backend):
+        """The direct writer needs SQLite locks that hold; on NFS/SMB calibre-debug writes instead"""
+        if backend != 'direct' or probe_filesystem(self.library_path).reliable_locks:
+            return backend
+        if self.library_path not in _unsafe_direct_libraries:
+            _unsafe_direct_libraries.add(self.library_path)
+            print(f"⚠ Database locks are unreliable on the filesystem of {self.library_path}; "
+                  "importing with calibre-debug instead of writing metadata.db directly")
+        return 'calibredb'
+
+    def add(self, file_path, title, published_date, series, key=None):
+        """Queue a PDF; returns the finished items when this fills a batch"""
+        with self.lock:
+            self.pending.append(BatchItem(file_path, title, published_date, series, key))
+            if len(self.pending) < self.batch_size:
+                return []
+            items, self.pending = self.pending, []
+        return self._import_items(items)
+
+    def flush(self):
+        """Import every pending PDF and return the items with .success set"""
+        with self.lock:
+            items, self.pending = self.pending, []
+        return self._import_items(items)
+
+    def _import_items(self, items):
+        """Import one batch, waiting for any batch another thread is running"""
+        if not items:
+            return []
+
+        with self.run_lock:
+            return self._import_batch(items)
+
+    def _import_batch(self, items):
+        """Import one batch, falling back to one-by-one imports when batching is unavailable"""
+        print(f"    📚 Importing batch of {len(items)} PDFs to Calibre...")
+        results, reason = self._run_batch(items)
+        if results is None:
+            print(f"    ⚠ Batch import unavailable ({reason}), importing one by one")
+            for item in items:
+                item.success = self.fallback(item.file_path, item.title, item.published_date, item.series) \
+                    if self.fallback else False
+            return items
+
+        for item, result in zip(items, results):
+            self._report(item, result)
+        return items
+
+    def _run_batch(self, items):
+        """Import the batch with the configured backend; returns (results, failure_reason)"""
+        if self.backend == 'direct':
+            return self._run_direct(items)
+        return self._run_calibre_debug(items)
+
+    def _run_direct(self, items):
+        """Write the whole batch into metadata.db in a single transaction"""
+        if calibre_gui_running():
+            return None, "Calibre is running"
+        books = [
+            {
+                'path': item.file_path,
+                'title': item.title,
+                'series': item.series,
+                'pubdate': item.published_date,
+            }
+            for item in items
+        ]
+        try:
+            with self.metrics.timed('direct_write'):
+                return CalibreLibraryWriter(self.library_path).add_books(books), None
+        except Exception as e:
+            return None, f"direct metadata.db write failed: {e}"
+
+    def _run_calibre_debug(self, items):
+        """Run one calibre-debug process for the batch"""
+        if not Path(self.debug_path).exists():
+            return None, f"calibre-debug not found at {self.debug_path}"
+        if calibre_gui_running():
+            return None, "Calibre is running"
+
+        manifest = {
+            'library_path': self.library_path,
+            'books': [
+                {
+                    'path': str(Path(item.file_path).resolve()),
+                    'title': item.title,
+                    'series': item.series,
+                    'pubdate': item.published_date.isoformat() if item.published_date else None,
+                }
+                for item in items
+            ],
+        }
+        fd, manifest_path = tempfile.mkstemp(prefix='calibre_batch_', suffix='.json')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(manifest, f)
+            script = f"MANIFEST_PATH = {manifest_path!r}\n" + BATCH_SCRIPT
+            timeout = 30 + 5 * len(items)
+
+            for attempt in range(self.max_retries):
+                try:
+                    with self.metrics.timed('calibre_debug'):
+                        result = subprocess.run([self.debug_path, '-c', script],
+                                                capture_output=True, text=True, timeout=timeout)
+                except subprocess.TimeoutExpired:
+                    return None, "batch timed out"
+
+                for line in result.stdout.split('\n'):
+                    if line.startswith('CALIBRE_BATCH_RESULT '):
+                        results = json.loads(line[len('CALIBRE_BATCH_RESULT '):])
+                        if len(results) == len(items):
+                            return results, None
+
+                error_msg = result.stderr.strip()
+                if "database is locked" in error_msg.lower() or "busyerror" in error_msg.lower():
+                    if attempt < self.max_retries - 1:
+                        wait_time = 2 ** attempt
+                        print(f"    ⚠ Database locked, retrying batch in {wait_time} seconds... (attempt {attempt + 1}/{self.max_retries})")
+                        self.metrics.count('lock_retries')
+                        self.metrics.count('backoff_seconds', wait_time)
+                        if self.limiter:
+                            # Pauses every import and lowers the import rate, as a per-file lock retry does
+                            self.limiter.back_off(wait_time)
+                            self.limiter.wait()
+                        else:
+                            time.sleep(wait_time)
+                        continue
+                    return None, f"database still locked after {self.max_retries} attempts"
+                return None, error_msg.splitlines()[-1] if error_msg else f"exit code {result.returncode}"
+
+            return None, "batch failed"
+        finally:
+            try:
+                os.unlink(manifest_path)
+            except OSError:
+                pass
+
+    def _report(self, item, result):
+        """Print the same per-file outcome lines as the one-by-one import"""
+        status = result.get('status')
+        if status == 'added':
+            item.success = True
+            print(f"    ✓ Imported to Calibre with metadata: {item.title}")
+            if item.series:
+                print(f"      Series: {item.series}")
+            if item.published_date:
+                print(f"      Published: {item.published_date}")
+        elif status == 'duplicate':
+            item.success = True
+            print(f"    ✓ Already in Calibre: {item.title}")
+        else:
+            item.success = False
+            print(f"    ✗ Calibre add failed: {item.title}: {result.get('error')}")
@@ -0,0 +1,274 @@
+import os
+import re
+import shutil
+import sqlite3
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+# The subset of Calibre's metadata.db schema this writer touches. create_library()
+# uses it to build a library that works without Calibre installed; real
+# libraries already contain these tables (and many more).
+LIBRARY_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS books (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL DEFAULT 'Unknown' COLLATE NOCASE,
+        sort TEXT COLLATE NOCASE,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        pubdate TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        series_index REAL NOT NULL DEFAULT 1.0,
+        author_sort TEXT COLLATE NOCASE,
+        isbn TEXT DEFAULT "" COLLATE NOCASE,
+        lccn TEXT DEFAULT "" COLLATE NOCASE,
+        path TEXT NOT NULL DEFAULT "",
+        flags INTEGER NOT NULL DEFAULT 1,
+        uuid TEXT,
+        has_cover BOOL DEFAULT 0,
+        last_modified TIMESTAMP NOT NULL DEFAULT "2000-01-01 00:00:00+00:00"
+    );
+    CREATE TABLE IF NOT EXISTS authors (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL COLLATE NOCASE,
+        sort TEXT COLLATE NOCASE,
+        link TEXT NOT NULL DEFAULT "",
+        UNIQUE(name)
+    );
+    CREATE TABLE IF NOT EXISTS books_authors_link (
+        id INTEGER PRIMARY KEY,
+        book INTEGER NOT NULL,
+        author INTEGER NOT NULL,
+        UNIQUE(book, author)
+    );
+    CREATE TABLE IF NOT EXISTS series (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL COLLATE NOCASE,
+        sort TEXT COLLATE NOCASE,
+        link TEXT NOT NULL DEFAULT "",
+        UNIQUE(name)
+    );
+    CREATE TABLE IF NOT EXISTS books_series_link (
+        id INTEGER PRIMARY KEY,
+        book INTEGER NOT NULL,
+        series INTEGER NOT NULL,
+        UNIQUE(book)
+    );
+    CREATE TABLE IF NOT EXISTS data (
+        id INTEGER PRIMARY KEY,
+        book INTEGER NOT NULL,
+        format TEXT NOT NULL COLLATE NOCASE,
+        uncompressed_size INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        UNIQUE(book, format)
+    );
+    CREATE TABLE IF NOT EXISTS metadata_dirtied (
+        id INTEGER PRIMARY KEY,
+        book INTEGER NOT NULL,
+        UNIQUE(book)
+    );
+    CREATE TRIGGER IF NOT EXISTS books_insert_trg AFTER INSERT ON books
+    BEGIN
+        UPDATE books SET sort=title_sort(NEW.title), uuid=uuid4() WHERE id=NEW.id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS series_insert_trg AFTER INSERT ON series
+    BEGIN
+        UPDATE series SET sort=title_sort(NEW.name) WHERE id=NEW.id;
+    END;
+"""
+
+UNKNOWN_AUTHOR = 'Unknown'
+UNDEFINED_DATE = '0101-01-01 00:00:00+00:00'  # What Calibre stores for "no date"
+PATH_LIMIT = 100  # Same per-component limit Calibre uses on Linux/macOS
+UNSAFE_PATH_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+
+def title_sort(title):
+    """Calibre's default title sort: move a leading English article to the end"""
+    if not title:
+        return title
+    match = re.match(r'^(A|The|An)\s+(.+)$', title, re.IGNORECASE)
+    if match:
+        return f"{match.group(2)}, {match.group(1)}"
+    return title
+
+
+def _safe_component(text, limit):
+    """Make a string safe to use as a single path component"""
+    text = UNSAFE_PATH_CHARS.sub('_', text or '').strip()
+    text = text[:limit].rstrip(' .')
+    return text or UNKNOWN_AUTHOR
+
+
+def _calibre_timestamp(value):
+    """Format a datetime the way Calibre stores timestamps"""
+    return value.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S+00:00')
+
+
+def _connect(db_path, busy_timeout):
+    """Open metadata.db with the SQL functions Calibre's triggers call"""
+    conn = sqlite3.connect(str(db_path), timeout=busy_timeout, isolation_level=None)
+    conn.execute(f'PRAGMA busy_timeout = {int(busy_timeout * 1000)}')
+    conn.create_function('title_sort', 1, title_sort)
+    conn.create_function('uuid4', 0, lambda: str(uuid.uuid4()))
+    return conn
+
+
+def create_library(library_path):
+    """Create an empty library with the tables the writer needs (no Calibre required)"""
+    library = Path(library_path).expanduser()
+    library.mkdir(parents=True, exist_ok=True)
+    conn = _connect(library / 'metadata.db', 30)
+    try:
+        conn.executescript(LIBRARY_SCHEMA)
+    finally:
+        conn.close()
+    return library
+
+
+class CalibreLibraryWriter:
+    """Add books straight into a Calibre library's metadata.db and folder layout"""
+
+    def __init__(self, library_path, busy_timeout=30):
+        self.library_path = Path(library_path).expanduser()
+        self.db_path = self.library_path / 'metadata.db'
+        self.busy_timeout = busy_timeout
+
+    def add_books(self, books):
+        """Add many books in one transaction.
+
+        books is a list of dicts with 'path', 'title', 'series' and 'pubdate'
+        (a date or None). Returns one result dict per book with 'status' set to
+        'added' (plus 'book_id'), 'duplicate' or 'error' (plus 'error').
+        """
+        if not self.db_path.exists():
+            raise FileNotFoundError(f"No Calibre library at {self.library_path}")
+
+        conn = _connect(self.db_path, self.busy_timeout)
+        created_dirs = []
+        results = []
+        try:
+            # IMMEDIATE takes the write lock up front (waiting up to busy_timeout)
+            # so the batch cannot fail halfway with "database is locked"
+            conn.execute('BEGIN IMMEDIATE')
+            author_id = self._get_or_create(conn, 'authors', UNKNOWN_AUTHOR, sort=UNKNOWN_AUTHOR)
+            for book in books:
+                # A savepoint per book lets one bad file fail without losing the batch
+                conn.execute('SAVEPOINT add_book')
+                dirs_before = len(created_dirs)
+                try:
+                    result = self._add_book(conn, author_id, book, created_dirs)
+                    conn.execute('RELEASE SAVEPOINT add_book')
+                except Exception as e:
+                    conn.execute('ROLLBACK TO SAVEPOINT add_book')
+                    conn.execute('RELEASE SAVEPOINT add_book')
+                    for book_dir in created_dirs[dirs_before:]:
+                        shutil.rmtree(book_dir, ignore_errors=True)
+                    del created_dirs[dirs_before:]
+                    result = {'status': 'error', 'error': str(e)}
+                results.append(result)
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            for book_dir in created_dirs:
+                shutil.rmtree(book_dir, ignore_errors=True)
+            raise
+        finally:
+            conn.close()
+        return results
+
+    def remove_books(self, book_ids):
+        """Delete books and their folders, e.g. once they have been copied to another library"""
+        conn = _connect(self.db_path, self.busy_timeout)
+        book_dirs = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for book_id in book_ids:
+                row = conn.execute('SELECT path FROM books WHERE id = ?', (book_id,)).fetchone()
+                if not row:
+                    continue
+                # Calibre's own libraries clean up every link table with a trigger; these are
+                # the ones create_library() makes
+                for table in ('books_authors_link', 'books_series_link', 'data', 'metadata_dirtied'):
+                    conn.execute(f'DELETE FROM {table} WHERE book = ?', (book_id,))
+                conn.execute('DELETE FROM books WHERE id = ?', (book_id,))
+                if row[0]:
+                    book_dirs.append(self.library_path / row[0])
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        for book_dir in book_dirs:
+            shutil.rmtree(book_dir, ignore_errors=True)
+            try:
+                book_dir.parent.rmdir()  # The author folder, once it is empty
+            except OSError:
+                pass
+        return len(book_dirs)
+
+    def _get_or_create(self, conn, table, name, sort=None):
+        """Return the id of an author or series row, inserting it if needed"""
+        row = conn.execute(f'SELECT id FROM {table} WHERE name = ?', (name,)).fetchone()
+        if row:
+            return row[0]
+        if sort is None:
+            cursor = conn.execute(f'INSERT INTO {table} (name) VALUES (?)', (name,))
+        else:
+            cursor = conn.execute(f'INSERT INTO {table} (name, sort) VALUES (?, ?)', (name, sort))
+        return cursor.lastrowid
+
+    def _add_book(self, conn, author_id, book, created_dirs):
+        """Insert one book row, its links and its file"""
+        title = book['title']
+        source = Path(book['path'])
+
+        # Same duplicate rule as calibredb add without --duplicates
+        if conn.execute('SELECT 1 FROM books WHERE title = ?', (title,)).fetchone():
+            return {'status': 'duplicate'}
+
+        now = _calibre_timestamp(datetime.now(timezone.utc))
+        pubdate = None
+        if book.get('pubdate'):
+            published = book['pubdate']
+            pubdate = _calibre_timestamp(
+                datetime(published.year, published.month, published.day, 12, tzinfo=timezone.utc)
+            )
+
+        cursor = conn.execute(
+            'INSERT INTO books (title, author_sort, timestamp, pubdate, last_modified) VALUES (?, ?, ?, ?, ?)',
+            (title, UNKNOWN_AUTHOR, now, pubdate or UNDEFINED_DATE, now)
+        )
+        book_id = cursor.lastrowid
+        conn.execute('INSERT INTO books_authors_link (book, author) VALUES (?, ?)', (book_id, author_id))
+
+        if book.get('series'):
+            series_id = self._get_or_create(conn, 'series', book['series'])
+            conn.execute('INSERT INTO books_series_link (book, series) VALUES (?, ?)', (book_id, series_id))
+
+        # Calibre layout: "<Author>/<Title> (<id>)/<Title> - <Author>.pdf"
+        suffix = f" ({book_id})"
+        limit = PATH_LIMIT - len(suffix) // 2 - 2
+        author_dir = _safe_component(UNKNOWN_AUTHOR, limit)
+        relative_path = f"{author_dir}/{_safe_component(title, limit)}{suffix}"
+        file_stem = f"{_safe_component(title, PATH_LIMIT - 7)} - {author_dir}"
+
+        book_dir = self.library_path / relative_path
+        book_dir.mkdir(parents=True, exist_ok=False)
+        created_dirs.append(book_dir)
+        target = book_dir / f"{file_stem}.pdf"
+        temp_target = book_dir / f".{file_stem}.pdf.tmp"
+        shutil.copyfile(source, temp_target)
+        os.replace(temp_target, target)
+
+        conn.execute('UPDATE books SET path = ? WHERE id = ?', (relative_path, book_id))
+        conn.execute(
+            'INSERT INTO data (book, format, uncompressed_size, name) VALUES (?, ?, ?, ?)',
+            (book_id, 'PDF', target.stat().st_size, file_stem)
+        )
+        # Ask Calibre to write the per-book metadata.opf backup next time it opens the library
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'metadata_dirtied'").fetchone():
+            conn.execute('INSERT OR IGNORE INTO metadata_dirtied (book) VALUES (?)', (book_id,))
+
+        return {'status': 'added', 'book_id': book_id}
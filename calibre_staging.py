@@ -0,0 +1,123 @@
+import os
+import sqlite3
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+from calibre_batch import CalibreBatchImporter
+from calibre_db_writer import CalibreLibraryWriter, create_library
+from run_metrics import RunMetrics
+
+
+class StagedBook:
+    """A book waiting in the staging library"""
+    __slots__ = ('book_id', 'file_path', 'title', 'published_date', 'series')
+
+    def __init__(self, book_id, file_path, title, published_date, series):
+        self.book_id = book_id
+        self.file_path = file_path
+        self.title = title
+        self.published_date = published_date
+        self.series = series
+
+
+class StagingLibrary:
+    """A local Calibre library that collects imports for one merge into a (network) library
+
+    Imports go into the staging library as usual. merge() reads the staged
+    books from its metadata.db and adds them to the target library as a
+    single batch (one calibre-debug process or one metadata.db transaction),
+    then removes them from staging. Books that fail to merge stay staged and
+    are retried by the next merge, also in a later run.
+    """
+
+    def __init__(self, path, target_path, calibre_cli_path, backend='calibredb', fallback=None, metrics=None,
+                 limiter=None):
+        self.path = Path(path).expanduser()
+        self.target_path = os.path.expanduser(target_path)
+        self.calibre_cli_path = calibre_cli_path
+        self.backend = backend
+        self.fallback = fallback  # Per-file import into the target, used when batching is unavailable
+        self.metrics = metrics or RunMetrics('calibre_staging')
+        self.limiter = limiter  # The import rate limiter, paced down while the target is locked
+        self.db_path = self.path / 'metadata.db'
+
+    def prepare(self):
+        """Create the staging library if needed; returns False when it cannot be used"""
+        if self.db_path.exists():
+            return True
+        self.path.mkdir(parents=True, exist_ok=True)
+        # calibredb creates a complete, empty library in an empty folder
+        try:
+            with self.metrics.timed('calibredb'):
+                subprocess.run([self.calibre_cli_path, 'list', '--library-path', str(self.path), '--limit', '1'],
+                               capture_output=True, text=True, timeout=30)
+        except (OSError, subprocess.SubprocessError):
+            pass
+        if not self.db_path.exists() and self.backend == 'direct':
+            create_library(self.path)
+        return self.db_path.exists()
+
+    def staged_books(self):
+        """Every book in the staging library that has a PDF, oldest first"""
+        if not self.db_path.exists():
+            return []
+        conn = sqlite3.connect(f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True, timeout=30)
+        try:
+            rows = conn.execute(
+                """
+                SELECT books.id, books.path, data.name, books.title, books.pubdate, series.name
+                FROM books
+                JOIN data ON data.book = books.id AND data.format = 'PDF'
+                LEFT JOIN books_series_link ON books_series_link.book = books.id
+                LEFT JOIN series ON series.id = books_series_link.series
+                ORDER BY books.id
+                """
+            ).fetchall()
+        finally:
+            conn.close()
+        return [
+            StagedBook(book_id, self.path / book_path / f"{name}.pdf", title, _parse_pubdate(pubdate), series)
+            for book_id, book_path, name, title, pubdate, series in rows
+        ]
+
+    def merge(self):
+        """Add every staged book to the target library in one batch; returns (merged, failed)"""
+        books = self.staged_books()
+        if not books:
+            return 0, 0
+        print(f"\n🔄 Merging {len(books)} staged books into {self.target_path}...")
+        start = time.perf_counter()
+        importer = CalibreBatchImporter(
+            self.calibre_cli_path, self.target_path, batch_size=len(books),
+            fallback=self.fallback, backend=self.backend, metrics=self.metrics, limiter=self.limiter
+        )
+        items = []
+        with self.metrics.timed('staging_merge'):
+            for book in books:
+                items += importer.add(str(book.file_path), book.title, book.published_date, book.series,
+                                      key=book.book_id)
+            items += importer.flush()
+
+        merged = [item.key for item in items if item.success]
+        failed = len(items) - len(merged)
+        if merged:
+            try:
+                CalibreLibraryWriter(self.path).remove_books(merged)
+            except Exception as e:
+                # They stay staged; the next merge finds them already in the target
+                print(f"Warning: Could not clear merged books from the staging library: {e}")
+        self.metrics.count('staging_merged', len(merged))
+        print(f"✓ Merged {len(merged)} books in {time.perf_counter() - start:.1f}s"
+              + (f", {failed} left staged for the next run" if failed else ''))
+        return len(merged), failed
+
+
+def _parse_pubdate(value):
+    """Calibre stores dates as text; 0101-01-01 means none"""
+    if not value or value.startswith('0101-'):
+        return None
+    try:
+        return datetime.strptime(value[:10], '%Y-%m-%d').date()
+    except ValueError:
+        return None
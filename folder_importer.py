@@ -1,12 +1,22 @@
 import os
 import json
 import subprocess
-import re
 import time
 import psutil
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
+from calibre_batch import CalibreBatchImporter
+from library_index import CalibreLibraryIndex
+from metadata_engine import MetadataExtractor
+from folder_scan_cache import FolderScanCache
+from folder_watcher import FolderWatcher
+from run_metrics import RunMetrics
+from run_profiler import RunProfiler
+from rate_limiter import AdaptiveRateLimiter
+from fs_probe import is_network_path, probe as probe_filesystem
 
 class PDFFolderImporter:
     def __init__(self):
@@ -16,6 +26,30 @@ class PDFFolderImporter:
         self.enable_calibre_import = False
         self.calibre_library_path = None
         self.series_mapping = {}
+        self.metadata_extractor = None
+        self.calibre_batch_size = 1
+        self.calibre_import_backend = 'calibredb'
+        self.skip_existing_in_library = True
+        self.library_index = None
+        self.import_workers = 1
+        self.use_scan_cache = True
+        self.scan_cache_path = 'folder_scan_cache.db'
+        self.scan_cache = None
+        self.scan_cache_skipped = 0
+        self._file_signatures = {}
+        self.recursive = None
+        self.watch_mode = False
+        self.watch_backend = 'auto'
+        self.watch_settle_seconds = 5
+        self.watch_batch_seconds = 10
+        self.watch_poll_seconds = 30
+        self.metrics = RunMetrics('folder_importer')
+        self.run_report = True
+        self.run_report_dir = 'logs'
+        self.metrics_textfile_dir = None
+        self.profile_run = False
+        self.calibre_imports_per_second = 10
+        self.import_limiter = AdaptiveRateLimiter(self.calibre_imports_per_second, min_rate=1, recover_seconds=10)
         
     def get_user_input(self):
         """Get user input for missing environment variables"""
@@ -57,15 +91,47 @@ class PDFFolderImporter:
                 self._update_env_file('CALIBRE_LIBRARY_PATH', self.calibre_library_path)
                 env_updated = True
         
+        # Optional performance settings (never prompted)
+        self.calibre_import_backend = (os.getenv('CALIBRE_IMPORT_BACKEND') or 'calibredb').lower()
+        if self.calibre_import_backend not in ['calibredb', 'direct']:
+            print(f"Warning: Unknown CALIBRE_IMPORT_BACKEND={self.calibre_import_backend}, using: calibredb")
+            self.calibre_import_backend = 'calibredb'
+        # The direct backend always batches so many books share one transaction
+        default_batch_size = 50 if self.calibre_import_backend == 'direct' else 1
+        self.calibre_batch_size = self._get_int_setting('CALIBRE_BATCH_SIZE', default_batch_size)
+        self.skip_existing_in_library = self._get_bool_setting('SKIP_EXISTING_IN_LIBRARY', True)
+        self.import_workers = self._get_int_setting('IMPORT_WORKERS', 1)
+        self.use_scan_cache = self._get_bool_setting('FOLDER_SCAN_CACHE', True)
+        self.scan_cache_path = os.getenv('FOLDER_SCAN_CACHE_PATH') or 'folder_scan_cache.db'
+        recursive_str = os.getenv('SEARCH_RECURSIVE')
+        if recursive_str:
+            self.recursive = recursive_str.lower() in ['true', 'yes', '1']
+        self.watch_mode = self._get_bool_setting('WATCH_FOLDER', False)
+        self.watch_backend = (os.getenv('WATCH_BACKEND') or 'auto').lower()
+        if self.watch_backend not in ['auto', 'inotify', 'polling']:
+            print(f"Warning: Unknown WATCH_BACKEND={self.watch_backend}, using: auto")
+            self.watch_backend = 'auto'
+        self.watch_settle_seconds = self._get_int_setting('WATCH_SETTLE_SECONDS', 5)
+        self.watch_batch_seconds = self._get_int_setting('WATCH_BATCH_SECONDS', 10)
+        self.watch_poll_seconds = self._get_int_setting('WATCH_POLL_SECONDS', 30)
+        self.run_report = self._get_bool_setting('RUN_REPORT', True)
+        self.run_report_dir = os.getenv('RUN_REPORT_DIR') or 'logs'
+        self.metrics_textfile_dir = os.getenv('METRICS_TEXTFILE_DIR') or None
+        self.profile_run = self._get_bool_setting('PROFILE_RUN', False)
+        self.calibre_imports_per_second = self._get_int_setting('CALIBRE_IMPORTS_PER_SECOND', 10)
+        self.import_limiter = AdaptiveRateLimiter(self.calibre_imports_per_second, min_rate=1, recover_seconds=10)
+        
         if env_updated:
             print("Environment variables updated in .env file")
             
         # Load series mapping
         self._load_series_mapping()
+        self._probe_filesystems()
         
         # Check Calibre status if enabled
         if self.enable_calibre_import:
             self._check_calibre_status()
+            self._load_library_index()
             
     def _update_env_file(self, key, value):
         """Update or add environment variable to .env file"""
@@ -92,6 +158,28 @@ class PDFFolderImporter:
         with open(env_file, 'w') as f:
             f.writelines(lines)
             
+    def _get_int_setting(self, key, default, minimum=1):
+        """Read an optional integer setting from the environment"""
+        value = os.getenv(key)
+        if not value:
+            return default
+        try:
+            number = int(value)
+        except ValueError:
+            print(f"Warning: Invalid {key}={value}, using default: {default}")
+            return default
+        if number < minimum:
+            print(f"Warning: {key} must be at least {minimum}, using: {minimum}")
+            return minimum
+        return number
+            
+    def _get_bool_setting(self, key, default):
+        """Read an optional true/false setting from the environment"""
+        value = os.getenv(key)
+        if not value:
+            return default
+        return value.lower() in ['true', 'yes', '1']
+            
     def _load_series_mapping(self):
         """Load series mapping from JSON file"""
         mapping_file = Path('series_mapping.json')
@@ -181,28 +269,49 @@ class PDFFolderImporter:
         except Exception as e:
             print(f"Warning: Could not clear lock files: {e}")
             
+    def _probe_filesystems(self):
+        """Look up the source and library filesystems once, before the first import"""
+        paths = [('Source folder', self.source_folder)]
+        if self.enable_calibre_import:
+            paths.append(('Calibre library', self.calibre_library_path))
+        for label, path in paths:
+            print(f"💾 {label}: {probe_filesystem(path).describe()}")
+            
     def _is_network_path(self, path):
-        """Check if path is on a network filesystem"""
+        """Check if path is on a network filesystem (mount table read once per run, see fs_probe)"""
+        return is_network_path(path)
+    
+    def _load_library_index(self):
+        """Load the library's existing titles once so re-imports can be skipped"""
+        if not self.skip_existing_in_library:
+            return
+        index = CalibreLibraryIndex(self.calibre_library_path)
+        if not index.available():
+            print("Library index unavailable (no local metadata.db), every file goes to Calibre")
+            return
         try:
-            # Check for common network mount indicators
-            if path.startswith(('/mnt/', '/media/', '/net/')):
-                return True
-            
-            # Check filesystem type
-            import subprocess
-            result = subprocess.run(['df', '-T', path], capture_output=True, text=True)
-            if result.returncode == 0:
-                # Look for network filesystem types
-                network_fs = ['nfs', 'cifs', 'smb', 'smbfs', 'fuse']
-                for line in result.stdout.split('\n'):
-                    for fs_type in network_fs:
-                        if fs_type in line.lower():
-                            return True
+            count = index.load()
+            self.library_index = index
+            print(f"✓ Indexed {count} books already in the Calibre library")
+        except Exception as e:
+            print(f"Warning: Could not index Calibre library: {e}")
             
+    def _already_in_library(self, title, series):
+        """Check the in-memory library index instead of spawning calibredb"""
+        if not self.library_index:
             return False
-        except:
+        try:
+            return self.library_index.contains(title, series)
+        except Exception as e:
+            print(f"    Warning: Library index lookup failed, importing anyway: {e}")
+            self.library_index = None
             return False
-    
+            
+    def _remember_import(self, title, series, published_date):
+        """Add a freshly imported book to the library index"""
+        if self.library_index:
+            self.library_index.add(title, series, published_date)
+            
     def _check_calibre_status(self):
         """Check if Calibre is running and provide guidance"""
         try:
@@ -213,7 +322,8 @@ class PDFFolderImporter:
             library_path = os.path.expanduser(self.calibre_library_path)
             test_cmd = [self.calibre_cli_path, 'list', '--library-path', library_path, '--limit', '1']
             
-            result = subprocess.run(test_cmd, capture_output=True, text=True, timeout=10)
+            with self.metrics.timed('calibredb'):
+                result = subprocess.run(test_cmd, capture_output=True, text=True, timeout=10)
             
             if result.returncode != 0:
                 error_msg = result.stderr.strip()
@@ -243,91 +353,32 @@ class PDFFolderImporter:
         except Exception as e:
             print(f"⚠ Warning: Could not test Calibre connection: {e}")
             
-    def _extract_metadata_from_filename(self, filename):
-        """Extract title, published date, and series from filename"""
-        # Remove file extension
-        name_without_ext = Path(filename).stem
-        
-        # Title is the filename without extension
-        title = name_without_ext
-        
-        # Try to extract date from filename (various formats)
-        published_date = None
-        date_match = None
-        
-        # Extended date patterns including partial dates
-        date_patterns = [
-            # Full dates
-            (r'(\d{4}-\d{2}-\d{2})', '%Y-%m-%d'),  # YYYY-MM-DD
-            (r'(\d{4}_\d{2}_\d{2})', '%Y_%m_%d'),  # YYYY_MM_DD
-            (r'(\d{2}-\d{2}-\d{4})', '%d-%m-%Y'),  # DD-MM-YYYY
-            (r'(\d{2}_\d{2}_\d{4})', '%d_%m_%Y'),  # DD_MM_YYYY
-            # Partial dates (year-month only)
-            (r'(\d{4}-\d{2})', '%Y-%m'),           # YYYY-MM
-            (r'(\d{4}_\d{2})', '%Y_%m'),           # YYYY_MM
-            # Year only
-            (r'(\d{4})', '%Y'),                    # YYYY
-        ]
-        
-        for pattern, date_format in date_patterns:
-            match = re.search(pattern, name_without_ext)
-            if match:
-                date_str = match.group(1)
-                date_match = match
-                try:
-                    if date_format == '%Y-%m' or date_format == '%Y_%m':
-                        # Partial date: YYYY-MM or YYYY_MM -> use first day of month
-                        parsed_date = datetime.strptime(date_str, date_format)
-                        published_date = parsed_date.replace(day=1).date()
-                    elif date_format == '%Y':
-                        # Year only -> use January 1st
-                        parsed_date = datetime.strptime(date_str, date_format)
-                        published_date = parsed_date.replace(month=1, day=1).date()
-                    else:
-                        # Full date
-                        published_date = datetime.strptime(date_str, date_format).date()
-                    break
-                except ValueError:
-                    continue
+    def _extract_metadata_from_filename(self, filename, notes=None):
+        """Extract title, published date, and series from filename
+        
+        Messages go to the notes list instead of stdout when one is given,
+        so worker threads can hand them to the main thread.
+        """
+        self._get_metadata_extractor()
+        title, published_date, series = self.metadata_extractor.extract(filename)
         
         # If no date found in filename, use today's date
         if not published_date:
             published_date = datetime.now().date()
-            print(f"    No date found in filename, using today: {published_date}")
+            message = f"    No date found in filename, using today: {published_date}"
+            if notes is None:
+                print(message)
+            else:
+                notes.append(message)
         
-        # Detect series from filename
-        series = None
+        return title, published_date, series
         
-        # First, try to find series from predefined mapping
-        for key, series_name in self.series_mapping.items():
-            if key.lower() in filename.lower():
-                series = series_name
-                break
+    def _get_metadata_extractor(self):
+        """The compiled extractor, rebuilt only when the mapping is replaced"""
+        if self.metadata_extractor is None or self.metadata_extractor.series_mapping is not self.series_mapping:
+            self.metadata_extractor = MetadataExtractor(self.series_mapping)
+        return self.metadata_extractor
         
-        # If no mapping found and we have a date match, extract series from filename before the date
-        if not series and date_match:
-            # Get the part of filename before the date
-            before_date = name_without_ext[:date_match.start()].strip()
-            
-            # Remove common separators at the end
-            before_date = before_date.rstrip('-_. ')
-            
-            if before_date:
-                series = before_date
-        elif not series:
-            # If no date match and no mapping, try to extract series from the whole filename
-            # Remove common document-like suffixes
-            clean_name = name_without_ext
-            for suffix in ['_document', '_doc', '_file', '_pdf']:
-                if clean_name.lower().endswith(suffix):
-                    clean_name = clean_name[:-len(suffix)]
-                    break
-            
-            if clean_name and clean_name != name_without_ext:
-                series = clean_name
-                
-        return title, published_date, series        
-
     def _import_to_calibre(self, file_path, title, published_date, series, max_retries=3):
         """Import PDF to Calibre with metadata"""
         if not self.enable_calibre_import:
@@ -348,7 +399,8 @@ class PDFFolderImporter:
                 ]
                 
                 # Run the add command
-                result = subprocess.run(add_cmd, capture_output=True, text=True, timeout=30)
+                with self.metrics.timed('calibredb'):
+                    result = subprocess.run(add_cmd, capture_output=True, text=True, timeout=30)
                 
                 if result.returncode != 0:
                     error_msg = result.stderr.strip()
@@ -371,7 +423,11 @@ class PDFFolderImporter:
                                 ]
                             
                             self._clear_calibre_locks()
-                            time.sleep(wait_time)
+                            self.metrics.count('lock_retries')
+                            self.metrics.count('backoff_seconds', wait_time)
+                            # Pauses the following imports too and lowers the import rate
+                            self.import_limiter.back_off(wait_time)
+                            self.import_limiter.wait()
                             continue
                         else:
                             print(f"    ✗ Database still locked after {max_retries} attempts")
@@ -398,7 +454,8 @@ class PDFFolderImporter:
                             '--title', title
                         ]
                         
-                        result = subprocess.run(add_cmd_with_server, capture_output=True, text=True, timeout=30)
+                        with self.metrics.timed('calibredb'):
+                            result = subprocess.run(add_cmd_with_server, capture_output=True, text=True, timeout=30)
                         
                         if result.returncode != 0:
                             print(f"    ✗ Calibre import failed (even with --with-library): {result.stderr}")
@@ -443,7 +500,8 @@ class PDFFolderImporter:
                             book_id
                         ] + metadata_updates
                         
-                        metadata_result = subprocess.run(metadata_cmd, capture_output=True, text=True, timeout=30)
+                        with self.metrics.timed('calibredb'):
+                            metadata_result = subprocess.run(metadata_cmd, capture_output=True, text=True, timeout=30)
                         
                         if metadata_result.returncode != 0:
                             print(f"    ⚠ Added to Calibre but metadata update failed: {title}")
@@ -465,21 +523,25 @@ class PDFFolderImporter:
                 print(f"    ✗ Calibre import timeout for: {title}")
                 if attempt < max_retries - 1:
                     print(f"    Retrying in {2 ** attempt} seconds...")
-                    time.sleep(2 ** attempt)
+                    self.metrics.count('backoff_seconds', 2 ** attempt)
+                    self.import_limiter.back_off(2 ** attempt)
+                    self.import_limiter.wait()
                     continue
                 return False
             except Exception as e:
                 print(f"    ✗ Calibre import error: {e}")
                 if attempt < max_retries - 1:
                     print(f"    Retrying in {2 ** attempt} seconds...")
-                    time.sleep(2 ** attempt)
+                    self.metrics.count('backoff_seconds', 2 ** attempt)
+                    self.import_limiter.back_off(2 ** attempt)
+                    self.import_limiter.wait()
                     continue
                 return False
         
         return False
             
     def _find_pdf_files(self, folder_path, recursive=True):
-        """Find all PDF files in the specified folder"""
+        """Find the PDF files in the specified folder that still need processing"""
         pdf_files = []
         folder = Path(folder_path)
         
@@ -493,17 +555,88 @@ class PDFFolderImporter:
         
         # Search for PDF files
         if recursive:
-            pattern = "**/*.pdf"
             print(f"Searching recursively for PDF files in: {folder_path}")
         else:
-            pattern = "*.pdf"
             print(f"Searching for PDF files in: {folder_path}")
-            
-        for pdf_file in folder.glob(pattern):
-            if pdf_file.is_file():
-                pdf_files.append(pdf_file)
-                
-        return sorted(pdf_files)
+        
+        # Files imported on an earlier run are dropped while scanning, so only
+        # new or changed files are kept in memory and processed
+        self.scan_cache_skipped = 0
+        self._file_signatures = {}
+        for pdf_file, size, mtime_ns in self._scan_folder(folder, recursive):
+            if self.scan_cache and self.scan_cache.is_done(pdf_file, size, mtime_ns):
+                self.scan_cache_skipped += 1
+                continue
+            pdf_files.append(pdf_file)
+            self._file_signatures[pdf_file] = (size, mtime_ns)
+        
+        self.metrics.count('files_unchanged', self.scan_cache_skipped)
+        if self.scan_cache_skipped:
+            print(f"⏭ Skipped {self.scan_cache_skipped} unchanged files already imported on earlier runs")
+        return pdf_files
+        
+    def _scan_folder(self, folder, recursive):
+        """Yield (path, size, mtime_ns) for every *.pdf file, in sorted path order"""
+        try:
+            entries = sorted(os.scandir(folder), key=lambda entry: entry.name)
+        except OSError as e:
+            print(f"Warning: Cannot read folder {folder}: {e}")
+            return
+        for entry in entries:
+            try:
+                # Symlinked folders are not followed (as with glob('**')), so a link
+                # loop on a NAS share cannot recurse forever
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        yield from self._scan_folder(Path(entry.path), recursive)
+                elif entry.name.endswith('.pdf') and entry.is_file():
+                    stat = entry.stat()
+                    yield Path(entry.path), stat.st_size, stat.st_mtime_ns
+            except OSError:
+                continue
+        
+    def _record_scan(self, pdf_file, status):
+        """Remember a file's outcome in the scan cache"""
+        if self.scan_cache and pdf_file in self._file_signatures:
+            size, mtime_ns = self._file_signatures[pdf_file]
+            self.scan_cache.record(pdf_file, size, mtime_ns, status)
+        
+    def _prepare_pdf(self, pdf_file):
+        """Check that a PDF is readable and extract its metadata; returns (pdf_file, metadata, error, notes)
+        
+        Runs in worker threads, so it prints nothing; notes holds the
+        messages for the main thread to print in file order.
+        """
+        notes = []
+        with self.metrics.timed('prepare'):
+            try:
+                if pdf_file.stat().st_size == 0:
+                    return pdf_file, None, "file is empty", notes
+                with open(pdf_file, 'rb') as f:
+                    f.read(1)
+            except OSError as e:
+                return pdf_file, None, str(e), notes
+            return pdf_file, self._extract_metadata_from_filename(pdf_file.name, notes), None, notes
+        
+    def _prepare_pdfs(self, pdf_files):
+        """Yield prepared PDFs in order, preparing up to a few per worker ahead in a thread pool"""
+        if self.import_workers == 1:
+            for pdf_file in pdf_files:
+                yield self._prepare_pdf(pdf_file)
+            return
+        
+        # Build the extractor here rather than racing to build it in the workers
+        self._get_metadata_extractor()
+        # A bounded window of futures keeps memory flat on very large folders
+        window = self.import_workers * 4
+        with ThreadPoolExecutor(max_workers=self.import_workers) as executor:
+            pending = deque()
+            for pdf_file in pdf_files:
+                pending.append(executor.submit(self._prepare_pdf, pdf_file))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
         
     def import_pdfs(self):
         """Import PDF files from the source folder"""
@@ -512,71 +645,205 @@ class PDFFolderImporter:
             source_path = os.path.expanduser(self.source_folder)
             
             # Ask user about recursive search
-            recursive_input = input("Search subdirectories recursively? (y/n, default: y): ").strip().lower()
-            recursive = recursive_input in ['', 'y', 'yes']
+            recursive = self._get_recursive()
+            
+            if self.use_scan_cache and self.scan_cache is None:
+                self.scan_cache = FolderScanCache(self.scan_cache_path)
             
             # Find all PDF files
-            pdf_files = self._find_pdf_files(source_path, recursive)
+            with self.metrics.timed('scan'):
+                pdf_files = self._find_pdf_files(source_path, recursive)
             
             total_pdfs = len(pdf_files)
             print(f"Found {total_pdfs} PDF files to process")
             
             if total_pdfs == 0:
-                print("No PDF files found in the specified folder")
+                if self.scan_cache_skipped:
+                    print("Nothing new to import")
+                else:
+                    print("No PDF files found in the specified folder")
                 return
             
-            # Process PDFs with progress tracking
-            imported_count = 0
-            skipped_count = 0
-            failed_count = 0
-            start_time = time.time()
+            self._process_pdfs(pdf_files)
+            
+        except Exception as e:
+            print(f"Error processing PDFs: {e}")
             
-            for i, pdf_file in enumerate(pdf_files, 1):
-                filename = pdf_file.name
-                print(f"[{i}/{total_pdfs}] Processing: {filename}")
+    def _get_recursive(self):
+        """Ask once whether subdirectories are searched (SEARCH_RECURSIVE answers it up front)"""
+        if self.recursive is None:
+            recursive_input = input("Search subdirectories recursively? (y/n, default: y): ").strip().lower()
+            self.recursive = recursive_input in ['', 'y', 'yes']
+        return self.recursive
+        
+    def _start_watcher(self):
+        """Start watching the source folder (inotify for local folders, polling for network mounts)"""
+        source_path = os.path.expanduser(self.source_folder)
+        if self.watch_backend == 'auto':
+            use_inotify = not self._is_network_path(source_path)
+        else:
+            use_inotify = self.watch_backend == 'inotify'
+        return FolderWatcher(
+            source_path, recursive=self._get_recursive(),
+            settle_seconds=self.watch_settle_seconds, batch_seconds=self.watch_batch_seconds,
+            poll_seconds=self.watch_poll_seconds, use_inotify=use_inotify
+        )
+        
+    def watch_folder(self, watcher):
+        """Import PDFs as they arrive in the source folder until interrupted"""
+        print(f"\n👀 Watching {watcher.folder} for new PDFs ({watcher.mode}), press Ctrl+C to stop")
+        try:
+            for arrivals in watcher.batches():
+                pdf_files = []
+                self._file_signatures = {}
+                for pdf_file, size, mtime_ns in arrivals:
+                    if self.scan_cache and self.scan_cache.is_done(pdf_file, size, mtime_ns):
+                        continue
+                    pdf_files.append(pdf_file)
+                    self._file_signatures[pdf_file] = (size, mtime_ns)
+                if not pdf_files:
+                    continue
                 
-                # Extract metadata from filename
-                title, published_date, series = self._extract_metadata_from_filename(filename)
+                print(f"\n📥 {len(pdf_files)} new PDF files arrived")
+                self.scan_cache_skipped = 0
+                try:
+                    self._process_pdfs(sorted(pdf_files))
+                except Exception as e:
+                    print(f"Error processing PDFs: {e}")
+                self._write_run_report(quiet=True)
+        except KeyboardInterrupt:
+            print("\nStopped watching")
+        finally:
+            watcher.close()
+            
+    def _process_pdfs(self, pdf_files):
+        """Extract metadata for a list of PDFs and import them to Calibre"""
+        total_pdfs = len(pdf_files)
+        
+        # Process PDFs with progress tracking
+        imported_count = 0
+        skipped_count = 0
+        failed_count = 0
+        unreadable_count = 0
+        present_count = 0
+        start_time = time.time()
+        
+        # Batch mode imports many PDFs per Calibre process instead of two per file.
+        # Calibre writes stay in this thread, so with several workers the imports
+        # are batched too; otherwise they would still run one calibredb at a time.
+        batch = None
+        batch_size = self.calibre_batch_size
+        if batch_size == 1 and self.import_workers > 1:
+            batch_size = self.import_workers * 4
+        batching = batch_size > 1 or self.calibre_import_backend == 'direct'
+        if self.enable_calibre_import and batching:
+            batch = CalibreBatchImporter(
+                self.calibre_cli_path, self.calibre_library_path,
+                batch_size=batch_size, fallback=self._import_to_calibre,
+                backend=self.calibre_import_backend, metrics=self.metrics, limiter=self.import_limiter
+            )
+        
+        # With several workers the per-file metadata lines are left out so
+        # the output stays readable
+        verbose = self.import_workers == 1
+        if not verbose:
+            imports = f", importing to Calibre in batches of {batch_size}" if batch else ''
+            print(f"Checking files with {self.import_workers} workers{imports}")
+        
+        for i, (pdf_file, metadata, error, notes) in enumerate(self._prepare_pdfs(pdf_files), 1):
+            filename = pdf_file.name
+            print(f"[{i}/{total_pdfs}] Processing: {filename}")
+            for note in notes:
+                print(note)
+            
+            if error:
+                print(f"    ✗ Cannot read file: {error}")
+                failed_count += 1
+                unreadable_count += 1
+                self._record_scan(pdf_file, 'failed')
+            else:
+                title, published_date, series = metadata
                 
                 # Show extracted metadata
-                print(f"    Title: {title}")
-                if published_date:
-                    print(f"    Published: {published_date}")
-                if series:
-                    print(f"    Series: {series}")
+                if verbose:
+                    print(f"    Title: {title}")
+                    if published_date:
+                        print(f"    Published: {published_date}")
+                    if series:
+                        print(f"    Series: {series}")
                 
                 # Import to Calibre if enabled
-                if self.enable_calibre_import:
+                if self.enable_calibre_import and self._already_in_library(title, series):
+                    print("    ⏭ Already in Calibre, skipping import")
+                    present_count += 1
+                    self._record_scan(pdf_file, 'present')
+                elif batch:
+                    self.import_limiter.wait()
+                    for item in batch.add(pdf_file, title, published_date, series, key=pdf_file):
+                        if item.success:
+                            self.import_limiter.success()
+                            imported_count += 1
+                            self._remember_import(item.title, item.series, item.published_date)
+                        else:
+                            failed_count += 1
+                        self._record_scan(item.key, 'imported' if item.success else 'failed')
+                elif self.enable_calibre_import:
+                    self.import_limiter.wait()
                     success = self._import_to_calibre(pdf_file, title, published_date, series)
                     if success:
+                        self.import_limiter.success()
                         imported_count += 1
+                        self._remember_import(title, series, published_date)
                     else:
                         failed_count += 1
+                    self._record_scan(pdf_file, 'imported' if success else 'failed')
                 else:
                     print(f"    ✓ Metadata extracted (Calibre import disabled)")
                     skipped_count += 1
-                
-                # Show progress
-                if i % 10 == 0 or i == total_pdfs:
-                    elapsed = time.time() - start_time
-                    rate = i / elapsed if elapsed > 0 else 0
-                    eta_seconds = (total_pdfs - i) / rate if rate > 0 else 0
-                    eta_minutes = eta_seconds / 60
-                    print(f"    Progress: {i}/{total_pdfs} ({rate:.1f} files/sec, ETA: {eta_minutes:.1f}min)")
-                
-                # Small delay to be respectful
-                time.sleep(0.1)
-                        
-            total_time = time.time() - start_time
-            print(f"\n✅ Processing completed in {total_time/60:.1f} minutes!")
-            print(f"   📚 Imported: {imported_count}")
-            if skipped_count > 0:
-                print(f"   ⏭ Skipped: {skipped_count}")
-            if failed_count > 0:
-                print(f"   ❌ Failed: {failed_count}")
-            
-        except Exception as e:
-            print(f"Error processing PDFs: {e}")
+                    self._record_scan(pdf_file, 'skipped')
+            
+            # Show progress (the rate counts finished files only, so it is
+            # the real throughput including time spent waiting on Calibre)
+            if i % 10 == 0 or i == total_pdfs:
+                elapsed = time.time() - start_time
+                rate = i / elapsed if elapsed > 0 else 0
+                eta_seconds = (total_pdfs - i) / rate if rate > 0 else 0
+                eta_minutes = eta_seconds / 60
+                print(f"    Progress: {i}/{total_pdfs} ({rate:.1f} files/sec, {imported_count} imported, ETA: {eta_minutes:.1f}min)")
+                if self.scan_cache:
+                    self.scan_cache.commit()
+        
+        if batch:
+            for item in batch.flush():
+                if item.success:
+                    imported_count += 1
+                    self._remember_import(item.title, item.series, item.published_date)
+                else:
+                    failed_count += 1
+                self._record_scan(item.key, 'imported' if item.success else 'failed')
+        if self.scan_cache:
+            self.scan_cache.commit()
+        
+        self.metrics.count('files_found', total_pdfs)
+        self.metrics.count('files_unreadable', unreadable_count)
+        self.metrics.count('calibre_imported', imported_count)
+        self.metrics.count('calibre_present', present_count)
+        self.metrics.count('calibre_failed', failed_count - unreadable_count)
+        self.metrics.set('rate_limited_seconds', round(self.import_limiter.waited_seconds, 3))
+        self.metrics.set('calibre_imports_per_second', round(self.import_limiter.rate, 2))
+                    
+        total_time = time.time() - start_time
+        rate = total_pdfs / total_time if total_time > 0 else 0
+        print(f"\n✅ Processing completed in {total_time/60:.1f} minutes ({rate:.1f} files/sec)!")
+        print(f"   📚 Imported: {imported_count}")
+        if present_count > 0:
+            print(f"   ⏭ Already in Calibre: {present_count}")
+        if self.scan_cache_skipped > 0:
+            print(f"   ⏭ Unchanged since an earlier run: {self.scan_cache_skipped}")
+        if skipped_count > 0:
+            print(f"   ⏭ Skipped: {skipped_count}")
+        if failed_count > 0:
+            print(f"   ❌ Failed: {failed_count}")
             
     def run(self):
         """Main execution method"""
@@ -586,10 +853,42 @@ class PDFFolderImporter:
         # Get user input for missing environment variables
         self.get_user_input()
         
+        # Watch mode starts watching before the catch-up import so files
+        # arriving in the meantime are not missed
+        watcher = self._start_watcher() if self.watch_mode else None
+        
+        # Optional profiling (CPU and allocations), written next to the logs
+        profiler = None
+        if self.profile_run:
+            profiler = RunProfiler('folder_importer', self.run_report_dir)
+            profiler.start()
+        
         # Import PDFs
         self.import_pdfs()
         
+        if watcher:
+            self.watch_folder(watcher)
+        
+        if profiler:
+            profiler.finish()
+        
+        if self.scan_cache:
+            self.scan_cache.close()
+        
+        self._write_run_report()
         print("Import process completed")
+        
+    def _write_run_report(self, quiet=False):
+        """Write the run's counters and timings as JSON and as a Prometheus textfile"""
+        if not self.run_report:
+            return
+        try:
+            report_path, prom_path = self.metrics.write(self.run_report_dir, self.metrics_textfile_dir)
+        except OSError as e:
+            print(f"Warning: Could not write run report: {e}")
+            return
+        if not quiet:
+            print(f"📊 Run report: {report_path} (Prometheus: {prom_path})")
 
 def main():
     importer = PDFFolderImporter()
@@ -0,0 +1,68 @@
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+
+class FolderScanCache:
+    """Remembers which source-folder files were imported, keyed by path, size and mtime"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            updated_at TEXT
+        );
+    """
+
+    # Files with these outcomes are skipped while their size and mtime stay the same
+    DONE_STATUSES = ('imported', 'present')
+
+    def __init__(self, path='folder_scan_cache.db'):
+        self.path = Path(path).expanduser()
+        self.conn = sqlite3.connect(str(self.path), timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(self.SCHEMA)
+        # One query up front; checking a file during the scan is then a dict lookup
+        self.done = {
+            path: (size, mtime_ns)
+            for path, size, mtime_ns in self.conn.execute(
+                'SELECT path, size, mtime_ns FROM files WHERE status IN (?, ?)', self.DONE_STATUSES
+            )
+        }
+
+    def close(self):
+        """Commit pending outcomes and close the cache database"""
+        if self.conn:
+            self.conn.commit()
+            self.conn.close()
+            self.conn = None
+
+    def is_done(self, path, size, mtime_ns):
+        """True if this exact file (same size and mtime) was already imported"""
+        return self.done.get(os.path.abspath(path)) == (size, mtime_ns)
+
+    def record(self, path, size, mtime_ns, status):
+        """Record the outcome ('imported', 'present', 'skipped' or 'failed') of a file; call commit() to persist"""
+        path = os.path.abspath(path)
+        self.conn.execute(
+            """
+            INSERT INTO files (path, size, mtime_ns, status, updated_at) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(path) DO UPDATE SET
+                size = excluded.size,
+                mtime_ns = excluded.mtime_ns,
+                status = excluded.status,
+                updated_at = excluded.updated_at
+            """,
+            (path, size, mtime_ns, status, datetime.now().isoformat(timespec='seconds'))
+        )
+        if status in self.DONE_STATUSES:
+            self.done[path] = (size, mtime_ns)
+        else:
+            self.done.pop(path, None)
+
+    def commit(self):
+        """Persist the outcomes recorded so far"""
+        self.conn.commit()
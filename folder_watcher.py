@@ -0,0 +1,288 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from stat import S_ISREG
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+MAX_BATCH = 200  # Hand over at most this many files at once during long bursts
+
+
+def _is_pdf(name):
+    """Same rule as the folder scan: a *.pdf name"""
+    return name.endswith('.pdf')
+
+
+def _load_libc():
+    """Return libc with the inotify calls, or None where inotify is not available"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class InotifySource:
+    """Kernel notifications for a local folder tree (Linux only)"""
+
+    def __init__(self, folder, recursive, libc):
+        self.folder = folder
+        self.recursive = recursive
+        self.libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}  # watch descriptor -> directory
+        self._watch_tree(folder, [])
+
+    def _watch_tree(self, directory, found):
+        """Watch a directory (and its subdirectories); PDFs already inside are added to found"""
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(str(directory)), WATCH_MASK)
+        if wd < 0:
+            print(f"Warning: Cannot watch {directory}: {os.strerror(ctypes.get_errno())}")
+            return
+        self.watches[wd] = directory
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if self.recursive:
+                        self._watch_tree(Path(entry.path), found)
+                elif _is_pdf(entry.name):
+                    found.append(Path(entry.path))
+            except OSError:
+                continue
+
+    def wait(self, timeout):
+        """Return PDF paths created or changed within timeout seconds (None waits for the next event)"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        changed = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + name_length].rstrip(b'\0'))
+            offset += name_length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped; walking the tree again finds whatever was missed
+                print("Warning: Too many filesystem events at once, rescanning the folder")
+                self.watches.clear()
+                self._watch_tree(self.folder, changed)
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            directory = self.watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = directory / name
+            if mask & IN_ISDIR:
+                # A new or moved-in folder: watch it and pick up files that
+                # landed before the watch was in place
+                if self.recursive and mask & (IN_CREATE | IN_MOVED_TO):
+                    self._watch_tree(path, changed)
+            elif _is_pdf(name):
+                changed.append(path)
+        return changed
+
+    def close(self):
+        """Stop watching"""
+        os.close(self.fd)
+
+
+class PollingSource:
+    """Periodic directory checks for folders inotify cannot see into (NFS, SMB/CIFS)
+
+    Only directories whose mtime changed are listed again, so an idle tree
+    costs one stat() per directory per poll rather than one per file.
+    """
+
+    # Directories modified this close to the previous poll are listed again,
+    # since coarse network mtimes can hide a second change in the same tick
+    RACY_SECONDS = 2
+
+    def __init__(self, folder, recursive, poll_seconds):
+        self.folder = folder
+        self.recursive = recursive
+        self.poll_seconds = poll_seconds
+        self.directories = {}  # directory -> (mtime_ns, set of entry names)
+        self.last_poll = time.time()
+        self.next_poll = time.monotonic() + poll_seconds
+        self._check_directory(folder, [], report=False)
+
+    def _check_directory(self, directory, found, report=True):
+        """List a directory if it changed and collect PDFs that were not there before"""
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except OSError:
+            self._forget(directory)
+            return
+        known = self.directories.get(directory)
+        racy = mtime_ns / 1e9 >= self.last_poll - self.RACY_SECONDS
+        if known and known[0] == mtime_ns and not racy:
+            if self.recursive:
+                for name in known[1]:
+                    child = directory / name
+                    if child in self.directories:
+                        self._check_directory(child, found, report)
+            return
+
+        previous = known[1] if known else set()
+        names = set()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            return
+        for entry in entries:
+            names.add(entry.name)
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if self.recursive:
+                        self._check_directory(Path(entry.path), found, report)
+                elif report and _is_pdf(entry.name) and entry.name not in previous:
+                    found.append(Path(entry.path))
+            except OSError:
+                continue
+        for name in previous - names:
+            self._forget(directory / name)
+        self.directories[directory] = (mtime_ns, names)
+
+    def _forget(self, directory):
+        """Drop a removed directory and everything below it"""
+        for known in [d for d in self.directories if d == directory or directory in d.parents]:
+            del self.directories[known]
+
+    def wait(self, timeout):
+        """Sleep until the next poll (or timeout) and return PDFs that appeared"""
+        delay = self.next_poll - time.monotonic()
+        if timeout is not None and timeout < delay:
+            time.sleep(max(timeout, 0))
+            return []
+        time.sleep(max(delay, 0))
+        found = []
+        poll_started = time.time()
+        self._check_directory(self.folder, found)
+        self.last_poll = poll_started
+        self.next_poll = time.monotonic() + self.poll_seconds
+        return found
+
+    def close(self):
+        """Nothing to release for polling"""
+
+
+class FolderWatcher:
+    """Report PDFs arriving in a folder once they are fully written
+
+    A file is handed over after its size and mtime have not changed for
+    settle_seconds. Files that settle around the same time are grouped, so a
+    burst of arrivals is imported as one batch (capped at batch_seconds of
+    waiting while other files are still being written).
+    """
+
+    def __init__(self, folder, recursive=True, settle_seconds=5, batch_seconds=10, poll_seconds=30,
+                 use_inotify=True):
+        self.folder = Path(folder)
+        self.settle_seconds = settle_seconds
+        self.batch_seconds = batch_seconds
+        self.pending = {}  # path -> ((size, mtime_ns), time of the last change)
+        self.ready = {}  # path -> (size, mtime_ns)
+        self.ready_since = None
+
+        libc = _load_libc() if use_inotify else None
+        self.source = None
+        if libc:
+            try:
+                self.source = InotifySource(self.folder, recursive, libc)
+                self.mode = 'inotify'
+            except OSError as e:
+                print(f"Warning: inotify unavailable ({e}), polling instead")
+        if self.source is None:
+            self.source = PollingSource(self.folder, recursive, poll_seconds)
+            self.mode = f'polling every {poll_seconds}s'
+
+    def batches(self):
+        """Yield lists of (path, size, mtime_ns) for settled PDFs, forever"""
+        while True:
+            # Recheck unsettled files every second; otherwise just wait for events
+            timeout = 1.0 if self.pending else None
+            for path in self.source.wait(timeout):
+                self._touch(path)
+
+            now = time.monotonic()
+            self._check_pending(now)
+            if not self.ready:
+                continue
+            if not self.pending or len(self.ready) >= MAX_BATCH or now - self.ready_since >= self.batch_seconds:
+                batch = [(path, size, mtime_ns) for path, (size, mtime_ns) in self.ready.items()]
+                self.ready = {}
+                self.ready_since = None
+                yield batch
+
+    def _touch(self, path):
+        """Start (or restart) the settle timer of a file that was created or written to"""
+        signature = self._signature(path)
+        if signature is None:
+            return
+        self.ready.pop(path, None)
+        known = self.pending.get(path)
+        if not known or known[0] != signature:
+            self.pending[path] = (signature, time.monotonic())
+
+    def _check_pending(self, now):
+        """Move files that stopped changing from pending to ready"""
+        for path, (signature, changed_at) in list(self.pending.items()):
+            current = self._signature(path)
+            if current is None:
+                del self.pending[path]  # Deleted or renamed away before it settled
+            elif current != signature:
+                self.pending[path] = (current, now)
+            elif now - changed_at >= self.settle_seconds:
+                del self.pending[path]
+                if not self.ready:
+                    self.ready_since = now
+                self.ready[path] = signature
+
+    def _signature(self, path):
+        """(size, mtime_ns) of a regular file, or None if it is gone"""
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        if not S_ISREG(stat.st_mode):
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def close(self):
+        """Stop watching the folder"""
+        self.source.close()
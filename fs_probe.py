@@ -0,0 +1,143 @@
+import os
+import subprocess
+import sys
+import threading
+
+# Filesystem types whose files live on another machine
+NETWORK_FS_TYPES = {
+    'nfs', 'nfs4', 'cifs', 'smb', 'smb2', 'smb3', 'smbfs', 'afpfs', 'webdav', 'davfs', '9p',
+    'ceph', 'glusterfs', 'lustre', 'gpfs', 'afs', 'ncpfs', 'sshfs',
+}
+# FUSE filesystems that fetch files over the network; any other fuse.* type (mergerfs,
+# unionfs, ntfs-3g, ...) is a layer over local disks and counts as local
+NETWORK_FUSE_TYPES = {
+    'fuse.sshfs', 'fuse.rclone', 'fuse.s3fs', 'fuse.gvfsd-fuse', 'fuse.davfs', 'fuse.davfs2',
+    'fuse.gcsfuse', 'fuse.goofys', 'fuse.curlftpfs', 'fuse.smbnetfs',
+}
+# Used only when the mount table cannot be read
+NETWORK_PATH_PREFIXES = ('/mnt/', '/media/', '/net/')
+
+_mounts = None
+_probes = {}
+_lock = threading.Lock()
+
+
+class FilesystemInfo:
+    """What a path's mount is and how SQLite locking behaves on it"""
+    __slots__ = ('path', 'mount_point', 'fs_type', 'is_network', 'reliable_locks')
+
+    def __init__(self, path, mount_point, fs_type, is_network, reliable_locks):
+        self.path = path
+        self.mount_point = mount_point
+        self.fs_type = fs_type  # None when the mount table could not be read
+        self.is_network = is_network
+        self.reliable_locks = reliable_locks
+
+    def describe(self):
+        """One line for the startup output"""
+        if self.fs_type is None:
+            kind = 'network (guessed from the path)' if self.is_network else 'local (guessed from the path)'
+            return f"{self.path} ({kind})"
+        kind = 'network' if self.is_network else 'local'
+        locks = '' if self.reliable_locks else ', database locks unreliable'
+        return f"{self.path} ({self.fs_type} on {self.mount_point}, {kind}{locks})"
+
+
+def probe(path):
+    """Filesystem details of path, looked up once per process"""
+    key = str(path)
+    info = _probes.get(key)
+    if info is None:
+        real_path = os.path.realpath(os.path.expanduser(key))
+        with _lock:
+            info = _probes.get(real_path)
+            if info is None:
+                info = _probes[real_path] = _probe(real_path)
+            _probes[key] = info
+    return info
+
+
+def is_network_path(path):
+    """Whether path is on a network filesystem (NFS, SMB, sshfs, ...)"""
+    return probe(path).is_network
+
+
+def _probe(path):
+    """Match an absolute, symlink-free path against the mount table"""
+    mounts = _mount_table()
+    if not mounts:
+        is_network = path.startswith(NETWORK_PATH_PREFIXES)
+        return FilesystemInfo(path, None, None, is_network, not is_network)
+
+    # The longest mount point containing the path; later entries win because they are mounted on top
+    mount_point, fs_type = '/', None
+    for point, point_type in mounts:
+        if _contains(point, path) and len(point) >= len(mount_point):
+            mount_point, fs_type = point, point_type
+    if fs_type is None:
+        is_network = path.startswith(NETWORK_PATH_PREFIXES)
+        return FilesystemInfo(path, None, None, is_network, not is_network)
+
+    is_network = _is_network_type(fs_type)
+    # SQLite's file locks are not honoured reliably across NFS/SMB clients, whatever the mount options
+    return FilesystemInfo(path, mount_point, fs_type, is_network, not is_network)
+
+
+def _contains(mount_point, path):
+    return mount_point == '/' or path == mount_point or path.startswith(mount_point.rstrip('/') + '/')
+
+
+def _is_network_type(fs_type):
+    fs_type = fs_type.lower()
+    if fs_type.startswith('fuse'):
+        return fs_type in NETWORK_FUSE_TYPES
+    return fs_type in NETWORK_FS_TYPES or fs_type.split('.')[0] in NETWORK_FS_TYPES
+
+
+def _mount_table():
+    """(mount point, type) of every mount, read once; empty when unavailable"""
+    global _mounts
+    if _mounts is None:
+        try:
+            _mounts = _read_mountinfo() if sys.platform.startswith('linux') else _read_mount_command()
+        except (OSError, subprocess.SubprocessError, ValueError):
+            _mounts = []
+    return _mounts
+
+
+def _read_mountinfo():
+    """Parse /proc/self/mountinfo (Linux)"""
+    mounts = []
+    with open('/proc/self/mountinfo') as f:
+        for line in f:
+            # 36 35 98:0 /mnt1 /mnt2 rw,noatime master:1 - ext3 /dev/root rw,errors=continue
+            before, _, after = line.partition(' - ')
+            fields = before.split()
+            after_fields = after.split()
+            if len(fields) < 6 or not after_fields:
+                continue
+            mounts.append((_unescape(fields[4]), after_fields[0]))
+    return mounts
+
+
+def _read_mount_command():
+    """Parse the output of mount (macOS and the BSDs), run once"""
+    result = subprocess.run(['mount'], capture_output=True, text=True, timeout=10)
+    if result.returncode != 0:
+        return []
+    mounts = []
+    for line in result.stdout.splitlines():
+        # //user@nas/books on /Volumes/books (smbfs, nodev, nosuid, mounted by user)
+        _, separator, rest = line.partition(' on ')
+        point, separator2, details = rest.rpartition(' (')
+        if not separator or not separator2:
+            continue
+        mounts.append((point, details.split(',')[0].strip(' )')))
+    return mounts
+
+
+def _unescape(field):
+    """mountinfo writes space, tab, newline and backslash as octal escapes"""
+    for escaped, char in (('\\040', ' '), ('\\011', '\t'), ('\\012', '\n'), ('\\134', '\\')):
+        field = field.replace(escaped, char)
+    return field
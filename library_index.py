@@ -0,0 +1,82 @@
+import os
+import sqlite3
+from pathlib import Path
+
+
+class CalibreLibraryIndex:
+    """In-memory title/series/pubdate index of a Calibre library's metadata.db
+
+    The index is loaded once and reloaded only when metadata.db (or its WAL)
+    changes on disk, so checking whether a book is already present costs a
+    couple of stat() calls instead of a calibredb process.
+    """
+
+    def __init__(self, library_path):
+        self.library_path = Path(os.path.expanduser(library_path))
+        self.db_path = self.library_path / 'metadata.db'
+        self.books = {}  # casefolded title -> list of (series, pubdate)
+        self.signature = None
+        self.loads = 0
+
+    def available(self):
+        """True when the library is a local folder with a metadata.db"""
+        return self.db_path.is_file()
+
+    def _current_signature(self):
+        """Size and mtime of metadata.db and its WAL, used to detect changes"""
+        signature = []
+        for path in (self.db_path, self.db_path.with_name('metadata.db-wal')):
+            try:
+                stat = path.stat()
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def load(self):
+        """Read every book's title, series and pubdate from metadata.db"""
+        signature = self._current_signature()
+        uri = f"{self.db_path.resolve().as_uri()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=10)
+        try:
+            rows = conn.execute(
+                """
+                SELECT books.title, series.name, books.pubdate
+                FROM books
+                LEFT JOIN books_series_link ON books_series_link.book = books.id
+                LEFT JOIN series ON series.id = books_series_link.series
+                """
+            ).fetchall()
+        finally:
+            conn.close()
+
+        books = {}
+        for title, series, pubdate in rows:
+            books.setdefault((title or '').casefold(), []).append((series, (pubdate or '')[:10]))
+        self.books = books
+        self.signature = signature
+        self.loads += 1
+        return len(rows)
+
+    def refresh_if_changed(self):
+        """Reload the index if metadata.db changed since it was last read"""
+        if self.signature != self._current_signature():
+            self.load()
+
+    def contains(self, title, series=None):
+        """Check whether a book with this title (and compatible series) is in the library"""
+        self.refresh_if_changed()
+        for existing_series, _ in self.books.get((title or '').casefold(), []):
+            if series is None or existing_series is None or existing_series.casefold() == series.casefold():
+                return True
+        return False
+
+    def add(self, title, series=None, published_date=None):
+        """Record a book imported by this run.
+
+        Our own import is what changed metadata.db, so the new signature is
+        adopted instead of reloading the whole index after every book.
+        """
+        pubdate = published_date.isoformat() if published_date else ''
+        self.books.setdefault((title or '').casefold(), []).append((series, pubdate))
+        self.signature = self._current_signature()
@@ -3,14 +3,138 @@ import asyncio
 import time
 import json
 import subprocess
-import re
 import signal
-import psutil
+import shutil
+import sys
+from functools import partial
 from datetime import datetime, timedelta
 from pathlib import Path
-from telethon import TelegramClient
-from telethon.tl.types import MessageMediaDocument
 from dotenv import load_dotenv
+from sync_ledger import SyncLedger
+from calibre_batch import CalibreBatchImporter, BatchItem
+from calibre_staging import StagingLibrary
+from library_index import CalibreLibraryIndex
+from metadata_engine import MetadataExtractor
+from run_metrics import RunMetrics
+from run_profiler import RunProfiler
+from rate_limiter import AdaptiveRateLimiter
+from fs_probe import is_network_path, probe as probe_filesystem
+
+# Resumed downloads restart on a request boundary, which keeps every request
+# within Telegram's offset/limit alignment rules
+DOWNLOAD_REQUEST_SIZE = 512 * 1024
+# Byte range fetched by each connection of a parallel download (a whole number
+# of requests, so every range starts on a request boundary)
+PARALLEL_RANGE_SIZE = 8 * 1024 * 1024
+# Messages per history request (iter_messages fetches pages of this size)
+HISTORY_PAGE_SIZE = 100
+# A download hit by FloodWait is resumed after the wait, at most this many times
+FLOOD_WAIT_RETRIES = 5
+
+class DownloadProgress:
+    """Progress counters shared by the download workers"""
+    def __init__(self, total=None, live=False, tag=''):
+        self.total = total  # None while the channel is still being scanned
+        self.live = live  # Daemon mode: PDFs keep arriving, so there is no total
+        self.tag = tag  # Channel name shown in labels when several channels run together
+        self.found = 0
+        self.completed = 0
+        self.downloaded = 0
+        self.existing = 0
+        self.deduplicated = 0
+        self.failed = 0
+        self.downloaded_mb = 0.0
+        self.record_size = 0  # Bytes of one queued PdfRecord, measured on the first record of each channel
+        self.newest_message_id = 0
+        self.failed_message_ids = set()
+        self.queued_message_ids = set()
+        self.in_flight_message_ids = set()  # Queued but not finished yet
+        self.start_time = time.time()
+        
+    def record(self, outcome, size_mb=0.0):
+        """Record a finished file ('downloaded', 'existing', 'deduplicated' or 'failed')"""
+        self.completed += 1
+        setattr(self, outcome, getattr(self, outcome) + 1)
+        self.downloaded_mb += size_mb
+        
+    def label(self, i):
+        """Position label such as [3/12], or [3/?] while still scanning"""
+        if self.live:
+            return f"[{self.tag}#{i}]"
+        total = self.total if self.total is not None else '?'
+        return f"[{self.tag}{i}/{total}]"
+        
+    def eta_text(self):
+        """Estimate remaining time from the overall completion rate"""
+        if self.live:
+            return f"{self.completed} PDFs since start"
+        if self.total is None:
+            return "ETA: scan in progress"
+        elapsed = time.time() - self.start_time
+        if self.completed == 0 or elapsed <= 0:
+            return "ETA: 0.0min"
+        remaining = max(self.total - self.completed, 0)
+        return f"ETA: {remaining * (elapsed / self.completed) / 60:.1f}min"
+        
+    def average_speed(self):
+        """Aggregate download throughput in MB/s"""
+        elapsed = time.time() - self.start_time
+        return self.downloaded_mb / elapsed if elapsed > 0 else 0.0
+
+class ChannelJob:
+    """A channel of the current run with its own date range, folder and progress"""
+    def __init__(self, name, start_date, end_date, pdf_folder, tag=''):
+        self.name = name
+        self.start_date = start_date
+        self.end_date = end_date
+        self.downloads_dir = Path(pdf_folder)
+        self.tag = tag  # Prefix for output lines; empty for single-channel runs
+        self.entity = None  # ResolvedChannel once looked up
+        self.progress = None
+
+class PdfRecord:
+    """What the download stage needs of a PDF message, instead of the Message itself
+
+    A Message carries its whole TL object graph (peer, media, entities, ...);
+    this keeps the ids, date, size and file name, plus what iter_download
+    needs to fetch the file without the Document object.
+    """
+    __slots__ = ('message_id', 'date', 'document_id', 'access_hash', 'file_reference', 'size', 'filename', 'dc_id')
+
+    def __init__(self, message_id, date, document_id, access_hash, file_reference, size, filename, dc_id):
+        self.message_id = message_id
+        self.date = date
+        self.document_id = document_id
+        self.access_hash = access_hash
+        self.file_reference = file_reference
+        self.size = size
+        self.filename = filename
+        self.dc_id = dc_id
+
+    @classmethod
+    def from_message(cls, message):
+        document = message.media.document
+        filename = next((attr.file_name for attr in document.attributes if hasattr(attr, 'file_name')), None)
+        return cls(message.id, message.date, document.id, document.access_hash, document.file_reference,
+                   document.size, filename or f"document_{message.id}.pdf", document.dc_id)
+
+    def location(self):
+        """The file location iter_download fetches the document from"""
+        from telethon.tl.types import InputDocumentFileLocation
+        return InputDocumentFileLocation(id=self.document_id, access_hash=self.access_hash,
+                                         file_reference=self.file_reference, thumb_size='')
+
+    def memory_size(self):
+        """Bytes this record and its fields take up"""
+        return sys.getsizeof(self) + sum(sys.getsizeof(getattr(self, name)) for name in self.__slots__)
+
+class ResolvedChannel:
+    """A configured channel's id and title, and the peer to pass to Telethon requests"""
+    def __init__(self, channel_id, title, peer, cached=False):
+        self.id = channel_id
+        self.title = title
+        self.peer = peer  # The looked-up entity, or an InputPeerChannel built from the cache
+        self.cached = cached  # Came from the ledger instead of a lookup
 
 class TelegramPDFExtractor:
     def __init__(self):
@@ -18,6 +142,8 @@ class TelegramPDFExtractor:
         self.api_id = None
         self.api_hash = None
         self.channel_name = None
+        self.channels_file = 'channels.json'
+        self.channels = []
         self.start_date = None
         self.end_date = None
         self.pdf_folder = None
@@ -25,7 +151,47 @@ class TelegramPDFExtractor:
         self.enable_calibre_import = False
         self.calibre_library_path = None
         self.series_mapping = {}
+        self.metadata_extractor = None
+        self.download_workers = 1
+        self.scan_queue_size = 20
+        self.max_download_attempts = 5
+        self.sync_ledger_path = 'sync_ledger.db'
+        self.incremental_sync = False
+        self.scan_documents_only = True
+        self.calibre_batch_size = 1
+        self.calibre_import_backend = 'calibredb'
+        self.skip_existing_in_library = True
+        self.library_index = None
+        self.calibre_batch = None
+        self.calibre_import_workers = 1
+        self.calibre_staging = 'auto'
+        self.calibre_staging_path = 'calibre_staging'
+        self.staging = None  # StagingLibrary while imports are staged locally
+        self._imports_running = 0
+        self._import_queue = None
+        self.dedup_documents = 'link'
+        self.parallel_download_connections = 1
+        self.parallel_download_threshold_mb = 50
+        self.daemon_mode = False
+        self.daemon_catch_up_minutes = 15
+        self.daemon_check_seconds = 30
+        self._documents_in_flight = {}
+        self._paths_in_flight = {}  # Target file -> document id being downloaded into it
+        self.ledger = None
         self.client = None
+        self.metrics = RunMetrics('extractor')
+        self.startup_times = None  # (step, seconds, note) while run() starts up
+        self.run_report = True
+        self.run_report_dir = 'logs'
+        self.metrics_textfile_dir = None
+        self.profile_run = False
+        self.profile_stall_ms = 100
+        self.telegram_requests_per_second = 10
+        self.rate_limiter = AdaptiveRateLimiter(
+            self.telegram_requests_per_second, max_rate=self.telegram_requests_per_second * 10
+        )
+        self.calibre_imports_per_second = 10
+        self.import_limiter = AdaptiveRateLimiter(self.calibre_imports_per_second, min_rate=1, recover_seconds=10)
         
     def get_user_input(self):
         """Get user input for missing environment variables"""
@@ -45,9 +211,10 @@ class TelegramPDFExtractor:
             self._update_env_file('API_HASH', self.api_hash)
             env_updated = True
             
-        # Check for Channel Name
+        # Check for Channel Name (a comma-separated list, or channels.json, for several channels)
+        self.channels_file = os.getenv('CHANNELS_FILE') or 'channels.json'
         self.channel_name = os.getenv('CHANNEL_NAME')
-        if not self.channel_name:
+        if not self.channel_name and not Path(self.channels_file).exists():
             self.channel_name = input("Enter the channel name (without @): ").strip()
             self._update_env_file('CHANNEL_NAME', self.channel_name)
             env_updated = True
@@ -86,6 +253,49 @@ class TelegramPDFExtractor:
                     self.calibre_library_path = '~/Documents/Calibre Library'
                 self._update_env_file('CALIBRE_LIBRARY_PATH', self.calibre_library_path)
                 env_updated = True
+        
+        # Optional performance settings (never prompted). Most defaults keep the old
+        # behaviour; CALIBRE_STAGING=auto, DEDUP_DOCUMENTS=link, SCAN_DOCUMENTS_ONLY=true
+        # and SKIP_EXISTING_IN_LIBRARY=true change it (see .env.example)
+        self.download_workers = self._get_int_setting('DOWNLOAD_WORKERS', 1)
+        self.scan_queue_size = self._get_int_setting('SCAN_QUEUE_SIZE', 20)
+        self.max_download_attempts = self._get_int_setting('MAX_DOWNLOAD_ATTEMPTS', 5)
+        self.sync_ledger_path = os.getenv('SYNC_LEDGER_PATH') or 'sync_ledger.db'
+        self.incremental_sync = self._get_bool_setting('INCREMENTAL_SYNC', False)
+        self.scan_documents_only = self._get_bool_setting('SCAN_DOCUMENTS_ONLY', True)
+        self.parallel_download_connections = self._get_int_setting('PARALLEL_DOWNLOAD_CONNECTIONS', 1)
+        self.parallel_download_threshold_mb = self._get_int_setting('PARALLEL_DOWNLOAD_THRESHOLD_MB', 50)
+        self.dedup_documents = (os.getenv('DEDUP_DOCUMENTS') or 'link').lower()
+        if self.dedup_documents not in ['link', 'skip', 'off']:
+            print(f"Warning: Unknown DEDUP_DOCUMENTS={self.dedup_documents}, using: link")
+            self.dedup_documents = 'link'
+        self.calibre_import_backend = (os.getenv('CALIBRE_IMPORT_BACKEND') or 'calibredb').lower()
+        if self.calibre_import_backend not in ['calibredb', 'direct']:
+            print(f"Warning: Unknown CALIBRE_IMPORT_BACKEND={self.calibre_import_backend}, using: calibredb")
+            self.calibre_import_backend = 'calibredb'
+        # The direct backend always batches so many books share one transaction
+        default_batch_size = 50 if self.calibre_import_backend == 'direct' else 1
+        self.calibre_batch_size = self._get_int_setting('CALIBRE_BATCH_SIZE', default_batch_size)
+        self.skip_existing_in_library = self._get_bool_setting('SKIP_EXISTING_IN_LIBRARY', True)
+        self.calibre_import_workers = self._get_int_setting('CALIBRE_IMPORT_WORKERS', 1)
+        self.daemon_mode = self._get_bool_setting('DAEMON_MODE', False)
+        self.daemon_catch_up_minutes = self._get_int_setting('DAEMON_CATCH_UP_MINUTES', 15)
+        self.run_report = self._get_bool_setting('RUN_REPORT', True)
+        self.run_report_dir = os.getenv('RUN_REPORT_DIR') or 'logs'
+        self.metrics_textfile_dir = os.getenv('METRICS_TEXTFILE_DIR') or None
+        self.profile_run = self._get_bool_setting('PROFILE_RUN', False)
+        self.profile_stall_ms = self._get_int_setting('PROFILE_STALL_MS', 100)
+        self.telegram_requests_per_second = self._get_int_setting('TELEGRAM_REQUESTS_PER_SECOND', 10)
+        self.rate_limiter = AdaptiveRateLimiter(
+            self.telegram_requests_per_second, max_rate=self.telegram_requests_per_second * 10
+        )
+        self.calibre_imports_per_second = self._get_int_setting('CALIBRE_IMPORTS_PER_SECOND', 10)
+        self.import_limiter = AdaptiveRateLimiter(self.calibre_imports_per_second, min_rate=1, recover_seconds=10)
+        self.calibre_staging = (os.getenv('CALIBRE_STAGING') or 'auto').lower()
+        if self.calibre_staging not in ['auto', 'always', 'never']:
+            print(f"Warning: Unknown CALIBRE_STAGING={self.calibre_staging}, using: auto")
+            self.calibre_staging = 'auto'
+        self.calibre_staging_path = os.getenv('CALIBRE_STAGING_PATH') or 'calibre_staging'
             
         # Check for Start Date
         start_date_str = os.getenv('START_DATE')
@@ -145,10 +355,10 @@ class TelegramPDFExtractor:
         # Load series mapping
         self._load_series_mapping()
         
-        # Check Calibre status if enabled
-        if self.enable_calibre_import:
-            self._check_calibre_status()
-            
+        # Work out which channels this run covers
+        self._load_channels()
+        self._probe_filesystems()
+        
     def _update_env_file(self, key, value):
         """Update or add environment variable to .env file"""
         env_file = Path('.env')
@@ -174,6 +384,93 @@ class TelegramPDFExtractor:
         with open(env_file, 'w') as f:
             f.writelines(lines)
             
+    def _get_int_setting(self, key, default, minimum=1):
+        """Read an optional integer setting from the environment"""
+        value = os.getenv(key)
+        if not value:
+            return default
+        try:
+            number = int(value)
+        except ValueError:
+            print(f"Warning: Invalid {key}={value}, using default: {default}")
+            return default
+        if number < minimum:
+            print(f"Warning: {key} must be at least {minimum}, using: {minimum}")
+            return minimum
+        return number
+            
+    def _get_bool_setting(self, key, default):
+        """Read an optional true/false setting from the environment"""
+        value = os.getenv(key)
+        if not value:
+            return default
+        return value.lower() in ['true', 'yes', '1']
+            
+    def _load_channels(self):
+        """Build the channel list from channels.json, or from CHANNEL_NAME (comma-separated)
+        
+        Entries in channels.json are channel names or objects such as
+        {"name": "...", "start_date": "2024-01-01", "end_date": "TODAY", "pdf_folder": "..."};
+        missing settings fall back to the .env values.
+        """
+        entries = []
+        channels_path = Path(self.channels_file)
+        if channels_path.exists():
+            try:
+                with open(channels_path, 'r') as f:
+                    entries = json.load(f)
+                print(f"Loaded {len(entries)} channels from {channels_path}")
+            except Exception as e:
+                print(f"Warning: Could not load {channels_path}: {e}")
+                entries = []
+        if not entries:
+            entries = [name.strip() for name in (self.channel_name or '').split(',') if name.strip()]
+        
+        multiple = len(entries) > 1
+        self.channels = []
+        for entry in entries:
+            if isinstance(entry, str):
+                entry = {'name': entry}
+            elif not isinstance(entry, dict):
+                print(f"Warning: Skipping channel entry that is neither a name nor an object: {entry!r}")
+                continue
+            name = str(entry.get('name', '')).strip().lstrip('@')
+            if not name:
+                print(f"Warning: Skipping channel entry without a name: {entry}")
+                continue
+            try:
+                start_date = self._parse_date_setting(entry.get('start_date'), self.start_date)
+                end_date = self._parse_date_setting(entry.get('end_date'), self.end_date)
+            except ValueError as e:
+                print(f"Warning: Skipping channel {name}, invalid date: {e}")
+                continue
+            self.channels.append(ChannelJob(
+                name, start_date, end_date, entry.get('pdf_folder') or self.pdf_folder,
+                tag=f"{name} " if multiple else ''
+            ))
+            
+    def _probe_filesystems(self):
+        """Look up the download and library filesystems once, before anything is written to them"""
+        paths = [('Downloads', job.downloads_dir) for job in self.channels]
+        if self.enable_calibre_import:
+            paths.append(('Calibre library', self.calibre_library_path))
+        seen = set()
+        for label, path in paths:
+            info = probe_filesystem(path)
+            if info.path not in seen:
+                seen.add(info.path)
+                print(f"💾 {label}: {info.describe()}")
+            
+    def _parse_date_setting(self, value, default):
+        """Parse a YYYY-MM-DD or TODAY date from channels.json, or return the default"""
+        if not value:
+            return default
+        if not isinstance(value, str):
+            raise ValueError(f"{value!r} is not a YYYY-MM-DD or TODAY string")
+        if value.upper() == 'TODAY':
+            return datetime.strptime(datetime.now().strftime('%Y-%m-%d'), '%Y-%m-%d')
+        return datetime.strptime(value, '%Y-%m-%d')
+            
     def _load_series_mapping(self):
         """Load series mapping from JSON file"""
         mapping_file = Path('series_mapping.json')
@@ -191,6 +488,7 @@ class TelegramPDFExtractor:
             
     def _kill_calibre_processes(self):
         """Kill any running Calibre processes that might lock the database"""
+        import psutil  # Only needed when the library is locked
         try:
             calibre_processes = []
             for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
@@ -264,65 +562,22 @@ class TelegramPDFExtractor:
             print(f"Warning: Could not clear lock files: {e}")
             
     def _is_network_path(self, path):
-        """Check if path is on a network filesystem"""
-        try:
-            # Check for common network mount indicators
-            if path.startswith(('/mnt/', '/media/', '/net/')):
-                return True
-            
-            # Check filesystem type
-            import subprocess
-            result = subprocess.run(['df', '-T', path], capture_output=True, text=True)
-            if result.returncode == 0:
-                # Look for network filesystem types
-                network_fs = ['nfs', 'cifs', 'smb', 'smbfs', 'fuse']
-                for line in result.stdout.split('\n'):
-                    for fs_type in network_fs:
-                        if fs_type in line.lower():
-                            return True
-            
-            return False
-        except:
-            return False
+        """Check if path is on a network filesystem (mount table read once per run, see fs_probe)"""
+        return is_network_path(path)
     
     def _handle_nas_database_lock(self):
         """Special handling for NAS database locks"""
-        library_path = os.path.expanduser(self.calibre_library_path)
         
         print("🔧 Attempting NAS-specific database lock fixes...")
         
-        # 1. Try to copy database locally for operations
-        local_temp_path = Path('/tmp/calibre_temp_lib')
-        try:
-            print("  1. Attempting to create local temporary library...")
-            if local_temp_path.exists():
-                import shutil
-                shutil.rmtree(local_temp_path)
-            
-            local_temp_path.mkdir(parents=True)
-            
-            # Copy essential database files
-            db_files = ['metadata.db', 'metadata_db_prefs_backup.json']
-            for db_file in db_files:
-                src = Path(library_path) / db_file
-                dst = local_temp_path / db_file
-                if src.exists():
-                    import shutil
-                    shutil.copy2(src, dst)
-                    print(f"    Copied {db_file} to local temp")
-            
-            # Test local library
-            test_cmd = [self.calibre_cli_path, 'list', '--library-path', str(local_temp_path), '--limit', '1']
-            result = subprocess.run(test_cmd, capture_output=True, text=True, timeout=5)
-            
-            if result.returncode == 0:
-                print("  ✓ Local temporary library works")
-                return str(local_temp_path)
-            else:
-                print("  ✗ Local temporary library failed")
-                
-        except Exception as e:
-            print(f"  ✗ Could not create local temporary library: {e}")
+        # 1. Imports can go to a local library and reach the NAS in one step per run
+        if self.staging is not None:
+            print(f"  1. Imports are staged locally in {self.calibre_staging_path} and merged at the end of the run")
+        elif self.calibre_staging == 'never':
+            print("  1. Staging is off: set CALIBRE_STAGING=auto to import into a local library")
+            print("     and merge into the NAS library once per run")
+        else:
+            print("  1. No staging library this run (see the startup output); imports go straight to the NAS library")
         
         # 2. Try using --with-library with network path
         print("  2. Trying --with-library option for network access...")
@@ -336,6 +591,32 @@ class TelegramPDFExtractor:
         
         return None
     
+    def _load_library_index(self):
+        """Load the library's existing titles once so re-imports can be skipped"""
+        if not self.skip_existing_in_library:
+            return
+        index = CalibreLibraryIndex(self.calibre_library_path)
+        if not index.available():
+            print("Library index unavailable (no local metadata.db), every file goes to Calibre")
+            return
+        try:
+            count = index.load()
+            self.library_index = index
+            print(f"✓ Indexed {count} books already in the Calibre library")
+        except Exception as e:
+            print(f"Warning: Could not index Calibre library: {e}")
+            
+    def _already_in_library(self, title, series):
+        """Check the in-memory library index instead of spawning calibredb"""
+        if not self.library_index:
+            return False
+        try:
+            return self.library_index.contains(title, series)
+        except Exception as e:
+            print(f"    Warning: Library index lookup failed, importing anyway: {e}")
+            self.library_index = None
+            return False
+            
     def _check_calibre_status(self):
         """Check if Calibre is running and provide guidance"""
         try:
@@ -346,7 +627,8 @@ class TelegramPDFExtractor:
             library_path = os.path.expanduser(self.calibre_library_path)
             test_cmd = [self.calibre_cli_path, 'list', '--library-path', library_path, '--limit', '1']
             
-            result = subprocess.run(test_cmd, capture_output=True, text=True, timeout=15)  # Longer timeout for NAS
+            with self.metrics.timed('calibredb'):
+                result = subprocess.run(test_cmd, capture_output=True, text=True, timeout=15)  # Longer timeout for NAS
             
             if result.returncode != 0:
                 error_msg = result.stderr.strip()
@@ -384,99 +666,26 @@ class TelegramPDFExtractor:
             
     def _extract_metadata_from_filename(self, filename):
         """Extract title, published date, and series from filename"""
-        # Remove file extension
-        name_without_ext = Path(filename).stem
-        
-        # Title is the filename without extension
-        title = name_without_ext
-        
-        # Try to extract date from filename (various formats)
-        published_date = None
-        date_match = None
-        
-        # Extended date patterns including partial dates
-        date_patterns = [
-            # Full dates
-            (r'(\d{4}-\d{2}-\d{2})', '%Y-%m-%d'),  # YYYY-MM-DD
-            (r'(\d{4}_\d{2}_\d{2})', '%Y_%m_%d'),  # YYYY_MM_DD
-            (r'(\d{2}-\d{2}-\d{4})', '%d-%m-%Y'),  # DD-MM-YYYY
-            (r'(\d{2}_\d{2}_\d{4})', '%d_%m_%Y'),  # DD_MM_YYYY
-            # Partial dates (year-month only)
-            (r'(\d{4}-\d{2})', '%Y-%m'),           # YYYY-MM
-            (r'(\d{4}_\d{2})', '%Y_%m'),           # YYYY_MM
-            # Year only
-            (r'(\d{4})', '%Y'),                    # YYYY
-        ]
-        
-        for pattern, date_format in date_patterns:
-            match = re.search(pattern, name_without_ext)
-            if match:
-                date_str = match.group(1)
-                date_match = match
-                try:
-                    if date_format == '%Y-%m' or date_format == '%Y_%m':
-                        # Partial date: YYYY-MM or YYYY_MM -> use first day of month
-                        parsed_date = datetime.strptime(date_str, date_format)
-                        published_date = parsed_date.replace(day=1).date()
-                    elif date_format == '%Y':
-                        # Year only -> use January 1st
-                        parsed_date = datetime.strptime(date_str, date_format)
-                        published_date = parsed_date.replace(month=1, day=1).date()
-                    else:
-                        # Full date
-                        published_date = datetime.strptime(date_str, date_format).date()
-                    break
-                except ValueError:
-                    continue
+        # The extractor is rebuilt only when the mapping is replaced
+        if self.metadata_extractor is None or self.metadata_extractor.series_mapping is not self.series_mapping:
+            self.metadata_extractor = MetadataExtractor(self.series_mapping)
+        title, published_date, series = self.metadata_extractor.extract(filename)
         
         # If no date found in filename, use today's date
         if not published_date:
             published_date = datetime.now().date()
             print(f"    No date found in filename, using today: {published_date}")
         
-        # Detect series from filename
-        series = None
-        
-        # First, try to find series from predefined mapping
-        for key, series_name in self.series_mapping.items():
-            if key.lower() in filename.lower():
-                series = series_name
-                break
-        
-        # If no mapping found and we have a date match, extract series from filename before the date
-        if not series and date_match:
-            # Get the part of filename before the date
-            before_date = name_without_ext[:date_match.start()].strip()
-            
-            # Remove common separators at the end
-            before_date = before_date.rstrip('-_. ')
-            
-            if before_date:
-                series = before_date
-        elif not series:
-            # If no date match and no mapping, try to extract series from the whole filename
-            # Remove common document-like suffixes
-            clean_name = name_without_ext
-            for suffix in ['_document', '_doc', '_file', '_pdf']:
-                if clean_name.lower().endswith(suffix):
-                    clean_name = clean_name[:-len(suffix)]
-                    break
-            
-            if clean_name and clean_name != name_without_ext:
-                series = clean_name
-                
         return title, published_date, series
         
-    def _import_to_calibre(self, file_path, title, published_date, series, max_retries=3):
-        """Import PDF to Calibre with metadata"""
+    def _import_to_calibre(self, file_path, title, published_date, series, max_retries=3, library_path=None):
+        """Import PDF to Calibre with metadata (into the staging library while staging)"""
         if not self.enable_calibre_import:
             return False
+        library_path = os.path.expanduser(library_path or self._import_library_path())
             
         for attempt in range(max_retries):
             try:
-                # Expand user path
-                library_path = os.path.expanduser(self.calibre_library_path)
-                
                 # Step 1: Try to add the book to Calibre
                 add_cmd = [
                     self.calibre_cli_path,
@@ -487,7 +696,8 @@ class TelegramPDFExtractor:
                 ]
                 
                 # Run the add command
-                result = subprocess.run(add_cmd, capture_output=True, text=True, timeout=30)
+                with self.metrics.timed('calibredb'):
+                    result = subprocess.run(add_cmd, capture_output=True, text=True, timeout=30)
                 
                 if result.returncode != 0:
                     error_msg = result.stderr.strip()
@@ -510,7 +720,11 @@ class TelegramPDFExtractor:
                                 ]
                             
                             self._clear_calibre_locks()
-                            time.sleep(wait_time)
+                            self.metrics.count('lock_retries')
+                            self.metrics.count('backoff_seconds', wait_time)
+                            # Pauses the other import workers too and lowers the import rate
+                            self.import_limiter.back_off(wait_time)
+                            self.import_limiter.wait()
                             continue
                         else:
                             print(f"    ✗ Database still locked after {max_retries} attempts")
@@ -537,7 +751,8 @@ class TelegramPDFExtractor:
                             '--title', title
                         ]
                         
-                        result = subprocess.run(add_cmd_with_server, capture_output=True, text=True, timeout=30)
+                        with self.metrics.timed('calibredb'):
+                            result = subprocess.run(add_cmd_with_server, capture_output=True, text=True, timeout=30)
                         
                         if result.returncode != 0:
                             print(f"    ✗ Calibre import failed (even with --with-library): {result.stderr}")
@@ -582,7 +797,8 @@ class TelegramPDFExtractor:
                             book_id
                         ] + metadata_updates
                         
-                        metadata_result = subprocess.run(metadata_cmd, capture_output=True, text=True, timeout=30)
+                        with self.metrics.timed('calibredb'):
+                            metadata_result = subprocess.run(metadata_cmd, capture_output=True, text=True, timeout=30)
                         
                         if metadata_result.returncode != 0:
                             print(f"    ⚠ Added to Calibre but metadata update failed: {title}")
@@ -604,14 +820,18 @@ class TelegramPDFExtractor:
                 print(f"    ✗ Calibre import timeout for: {title}")
                 if attempt < max_retries - 1:
                     print(f"    Retrying in {2 ** attempt} seconds...")
-                    time.sleep(2 ** attempt)
+                    self.metrics.count('backoff_seconds', 2 ** attempt)
+                    self.import_limiter.back_off(2 ** attempt)
+                    self.import_limiter.wait()
                     continue
                 return False
             except Exception as e:
                 print(f"    ✗ Calibre import error: {e}")
                 if attempt < max_retries - 1:
                     print(f"    Retrying in {2 ** attempt} seconds...")
-                    time.sleep(2 ** attempt)
+                    self.metrics.count('backoff_seconds', 2 ** attempt)
+                    self.import_limiter.back_off(2 ** attempt)
+                    self.import_limiter.wait()
                     continue
                 return False
         
@@ -619,147 +839,977 @@ class TelegramPDFExtractor:
             
     async def connect_to_telegram(self):
         """Initialize and connect to Telegram client"""
+        from telethon import TelegramClient
         self.client = TelegramClient('session', int(self.api_id), self.api_hash)
         await self.client.start()
         print("Connected to Telegram successfully!")
         
     async def extract_pdfs(self):
-        """Extract PDF files from the specified channel"""
+        """Extract PDF files from the configured channels"""
         try:
-            # Get the channel entity
-            channel = await self.client.get_entity(self.channel_name)
-            print(f"Found channel: {channel.title}")
-            
-            # Create PDF storage directory
-            downloads_dir = Path(self.pdf_folder)
-            downloads_dir.mkdir(exist_ok=True)
-            
-            # First pass: collect all PDF messages
-            print(f"Scanning for PDF files from {self.start_date.date()} to {self.end_date.date()}...")
-            pdf_messages = []
-            
-            # Use offset_date to start from a day after end_date to ensure we capture all messages
-            # Then iterate backwards through all messages until we go past start_date
-            from datetime import timedelta
-            search_start = self.end_date + timedelta(days=1)
-            
-            message_count = 0
-            async for message in self.client.iter_messages(
-                channel, 
-                offset_date=search_start
-            ):
-                message_count += 1
-                
-                # Stop if we've gone past our start date
-                if message.date.date() < self.start_date.date():
-                    break
-                    
-                # Check if message is within our date range
-                if self.start_date.date() <= message.date.date() <= self.end_date.date():
-                    # Check if message has a document
-                    if message.media and isinstance(message.media, MessageMediaDocument):
-                        document = message.media.document
-                        
-                        # Check if it's a PDF file
-                        if document.mime_type == 'application/pdf':
-                            pdf_messages.append(message)
-                            
-                # Show progress every 100 messages
-                if message_count % 100 == 0:
-                    print(f"  Scanned {message_count} messages, found {len(pdf_messages)} PDFs so far...")
+            jobs = await self._resolve_channels()
+            if not jobs:
+                return
+            for job in jobs:
+                job.progress = DownloadProgress(tag=job.tag)
             
-            print(f"Finished scanning {message_count} messages")
+            queue, workers, import_workers = self._start_pipeline()
+            try:
+                # Channels are scanned concurrently; they all feed the same
+                # download queue, so DOWNLOAD_WORKERS is a limit for the whole run
+                results = await asyncio.gather(
+                    *(self._scan_channel(job, queue) for job in jobs), return_exceptions=True
+                )
+            finally:
+                await self._stop_pipeline(queue, workers, import_workers)
+                await self._merge_staging()
             
-            total_pdfs = len(pdf_messages)
-            print(f"Found {total_pdfs} PDF files to download")
+            for job, result in zip(jobs, results):
+                if isinstance(result, Exception):
+                    print(f"Error scanning {job.name}: {result}")
+                    self._forget_channel(job)
+                    continue
+                self._advance_checkpoint(job)
+                if len(jobs) > 1:
+                    print(f"\n📺 {job.name}")
+                if job.progress.total == 0:
+                    print("No PDF files found in the specified date range")
+                    continue
+                self._print_summary(job.progress)
+            
+        except Exception as e:
+            print(f"Error extracting PDFs: {e}")
+            
+    async def _resolve_channels(self):
+        """Look up every configured channel and create its PDF folder"""
+        if not self.channels:
+            self._load_channels()
+        self._open_ledger()
+        resolve_start = time.perf_counter()
+        jobs = []
+        for job in self.channels:
+            try:
+                job.entity = await self._resolve_channel(job.name)
+            except Exception as e:
+                print(f"Error: Could not find channel {job.name}: {e}")
+                continue
+            print(f"Found channel: {job.entity.title}" + (" (cached)" if job.entity.cached else ""))
+            job.downloads_dir.mkdir(parents=True, exist_ok=True)
+            jobs.append(job)
+        cached = sum(1 for job in jobs if job.entity.cached)
+        self._startup_step('channels', resolve_start, f"{cached}/{len(jobs)} cached" if jobs else None)
+        self._print_startup_times()
+        return jobs
+        
+    async def _resolve_channel(self, name):
+        """The channel from the ledger's cache, or looked up on Telegram (and cached) the first time"""
+        from telethon import utils
+        from telethon.tl.types import InputPeerChannel
+        cached = self.ledger.get_channel_entity(name)
+        if cached:
+            channel_id, access_hash, title = cached
+            return ResolvedChannel(channel_id, title, InputPeerChannel(channel_id, access_hash), cached=True)
+        entity = await self.client.get_entity(name)
+        try:
+            input_peer = utils.get_input_peer(entity)
+        except TypeError:
+            input_peer = None  # No usable access hash to remember
+        if isinstance(input_peer, InputPeerChannel):
+            self.ledger.set_channel_entity(name, entity.id, input_peer.access_hash, entity.title)
+        return ResolvedChannel(entity.id, entity.title, entity)
+        
+    def _forget_channel(self, job):
+        """Look the channel up again next run; its cached access hash may be what failed"""
+        if job.entity and job.entity.cached:
+            self.ledger.forget_channel_entity(job.name)
+        
+    def _open_ledger(self):
+        """Open the sync ledger on first use"""
+        if self.ledger is None:
+            self.ledger = SyncLedger(self.sync_ledger_path)
+            
+            
+    def _start_pipeline(self):
+        """Start the download and Calibre import workers; returns (queue, workers, import_workers)"""
+        self._open_ledger()
+        batching = self.calibre_batch_size > 1 or self.calibre_import_backend == 'direct'
+        if self.enable_calibre_import and batching and self.calibre_batch is None:
+            self.calibre_batch = CalibreBatchImporter(
+                self.calibre_cli_path, self._import_library_path(),
+                batch_size=self.calibre_batch_size, fallback=self._import_to_calibre,
+                backend=self.calibre_import_backend, metrics=self.metrics, limiter=self.import_limiter
+            )
+        
+        # Start the download workers first so they pick up PDFs as soon as
+        # the scanner finds them. The bounded queue makes the scanner wait
+        # when downloads fall behind, which also caps memory use.
+        queue = asyncio.Queue(maxsize=self.scan_queue_size)
+        if self.download_workers > 1:
+            print(f"Downloading with {self.download_workers} concurrent workers")
+        workers = [asyncio.ensure_future(self._download_worker(queue)) for _ in range(self.download_workers)]
+        
+        # Calibre imports block on calibredb, so they run as a separate
+        # stage in worker threads and drain behind the downloads
+        import_workers = []
+        if self.enable_calibre_import:
+            self._import_queue = asyncio.Queue()
+            import_workers = [
+                asyncio.ensure_future(self._import_worker())
+                for _ in range(self.calibre_import_workers)
+            ]
+        return queue, workers, import_workers
+        
+    async def _stop_pipeline(self, queue, workers, import_workers):
+        """Let the queued downloads and imports finish, then stop the workers"""
+        for _ in workers:
+            await queue.put(None)  # One stop marker per worker
+        await asyncio.gather(*workers)
+        await self._finish_imports(import_workers)
+        
+    def _print_summary(self, progress):
+        """Print the totals of a run"""
+        total_time = time.time() - progress.start_time
+        handled = progress.downloaded + progress.existing + progress.deduplicated
+        print(f"\n✅ Successfully downloaded {handled} PDF files in {total_time/60:.1f} minutes!")
+        print(f"   ⬇ New: {progress.downloaded} ({progress.average_speed():.1f}MB/s average)")
+        if progress.existing > 0:
+            print(f"   ⏭ Already present: {progress.existing}")
+        if progress.deduplicated > 0:
+            print(f"   ♻ Same document seen before, reused locally: {progress.deduplicated}")
+        if progress.failed > 0:
+            print(f"   ❌ Failed: {progress.failed}")
             
-            if total_pdfs == 0:
-                print("No PDF files found in the specified date range")
+    async def run_daemon(self):
+        """Keep the session open, download PDFs as they are posted and catch up after reconnects"""
+        from telethon import events, utils
+        try:
+            jobs = await self._resolve_channels()
+            if not jobs:
                 return
+            for job in jobs:
+                job.progress = DownloadProgress(live=True, tag=job.tag)
+            jobs_by_peer = {utils.get_peer_id(job.entity.peer): job for job in jobs}
+            
+            queue, workers, import_workers = self._start_pipeline()
+            
+            stop = asyncio.Event()
+            loop = asyncio.get_event_loop()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    loop.add_signal_handler(sig, stop.set)
+                except (NotImplementedError, RuntimeError):
+                    pass  # Not supported on this platform; Ctrl+C still ends the process
             
-            # Download PDFs with progress tracking
-            pdf_count = 0
-            start_time = time.time()
+            async def on_new_message(event):
+                job = jobs_by_peer.get(event.chat_id)
+                if job is None:
+                    return
+                job.progress.newest_message_id = max(job.progress.newest_message_id, event.message.id)
+                await self._queue_pdf_message(job, event.message, queue)
+            self.client.add_event_handler(
+                on_new_message, events.NewMessage(chats=[job.entity.peer for job in jobs])
+            )
             
-            for i, message in enumerate(pdf_messages, 1):
-                document = message.media.document
+            try:
+                # First run: the usual dated scan. Later runs resume from the
+                # ledger checkpoint, which also covers the time the daemon was down.
+                await asyncio.gather(*(self._start_daemon_channel(job, queue) for job in jobs))
                 
-                # Get original filename or create one
-                filename = None
-                for attr in document.attributes:
-                    if hasattr(attr, 'file_name'):
-                        filename = attr.file_name
+                names = ', '.join(job.entity.title for job in jobs)
+                print(f"\n👀 Waiting for new PDFs in {names} (Ctrl+C to stop)")
+                last_catch_up = time.time()
+                was_connected = True
+                while not stop.is_set():
+                    try:
+                        await asyncio.wait_for(stop.wait(), timeout=self.daemon_check_seconds)
                         break
-                        
-                if not filename:
-                    filename = f"document_{message.id}.pdf"
+                    except asyncio.TimeoutError:
+                        pass
                     
-                # Create month folder
-                month_folder = downloads_dir / f"{message.date.year}-{message.date.month:02d}"
-                month_folder.mkdir(exist_ok=True)
-                
-                # Check if file already exists
-                file_path = month_folder / filename
-                if file_path.exists():
-                    print(f"[{i}/{total_pdfs}] File exists: {filename}")
-                    # Still try to import to Calibre if enabled
-                    if self.enable_calibre_import:
-                        title, published_date, series = self._extract_metadata_from_filename(filename)
-                        self._import_to_calibre(file_path, title, published_date, series)
-                    pdf_count += 1
-                    continue
-                
-                # Download the file with progress
-                file_size_mb = document.size / (1024 * 1024) if document.size else 0
-                print(f"[{i}/{total_pdfs}] Downloading: {filename} ({file_size_mb:.1f}MB)")
-                
-                download_start = time.time()
-                await self.client.download_media(message, file_path)
-                download_time = time.time() - download_start
-                
-                pdf_count += 1
-                
-                # Show download speed and ETA
-                if download_time > 0:
-                    speed_mbps = file_size_mb / download_time
-                    elapsed = time.time() - start_time
-                    avg_time_per_file = elapsed / i
-                    eta_seconds = (total_pdfs - i) * avg_time_per_file
-                    eta_minutes = eta_seconds / 60
+                    # Telethon reconnects on its own; a connection seen down here
+                    # means updates may have been missed while it was away
+                    if not self.client.is_connected():
+                        if was_connected:
+                            print("⚠ Lost connection to Telegram, reconnecting...")
+                        was_connected = False
+                        try:
+                            await self.client.connect()
+                        except Exception as e:
+                            print(f"    Reconnect failed: {e}")
+                            continue
+                    catch_up_due = time.time() - last_catch_up >= self.daemon_catch_up_minutes * 60
+                    if not was_connected or catch_up_due:
+                        if not was_connected:
+                            print("✓ Reconnected, catching up on missed messages")
+                        was_connected = True
+                        results = await asyncio.gather(
+                            *(self._catch_up_channel(job, queue) for job in jobs), return_exceptions=True
+                        )
+                        for job, result in zip(jobs, results):
+                            if isinstance(result, Exception):
+                                print(f"Warning: Catch-up scan of {job.name} failed, retrying later: {result}")
+                                self._forget_channel(job)
+                        last_catch_up = time.time()
                     
-                    print(f"    ✓ Downloaded in {download_time:.1f}s ({speed_mbps:.1f}MB/s) - ETA: {eta_minutes:.1f}min")
-                
-                # Import to Calibre if enabled
-                if self.enable_calibre_import:
-                    title, published_date, series = self._extract_metadata_from_filename(filename)
-                    self._import_to_calibre(file_path, title, published_date, series)
+                    for job in jobs:
+                        self._advance_checkpoint(job)
+                    await self._flush_idle_batch()
+                    if self.staging and self._import_queue.empty() and not self._imports_running:
+                        await self._merge_staging()
+                    self._write_run_report(quiet=True)
+            finally:
+                self.client.remove_event_handler(on_new_message)
+                print("\nStopping, finishing queued downloads and imports...")
+                await self._stop_pipeline(queue, workers, import_workers)
+                await self._merge_staging()
+                for job in jobs:
+                    self._advance_checkpoint(job)
+            
+            for job in jobs:
+                if len(jobs) > 1:
+                    print(f"\n📺 {job.name}")
+                self._print_summary(job.progress)
+            
+        except Exception as e:
+            print(f"Error in daemon mode: {e}")
+            
+    async def _start_daemon_channel(self, job, queue):
+        """Initial scan of a channel in daemon mode: dated the first time, from the checkpoint after that"""
+        if self.ledger.get_checkpoint(job.entity.id):
+            await self._catch_up_channel(job, queue)
+        else:
+            await self._scan_channel(job, queue)
+        job.progress.total = None
+            
+    async def _catch_up_channel(self, job, queue):
+        """Queue PDFs posted after the ledger checkpoint (no date limits)"""
+        min_id = self.ledger.get_checkpoint(job.entity.id)
+        from telethon.tl.types import InputMessagesFilterDocument
+        message_filter = InputMessagesFilterDocument if self.scan_documents_only else None
+        queued = 0
+        scanned = 0
+        scan_start = time.perf_counter()
+        async for message in self._iter_history(job.entity.peer, min_id=min_id, filter=message_filter):
+            scanned += 1
+            job.progress.newest_message_id = max(job.progress.newest_message_id, message.id)
+            if await self._queue_pdf_message(job, message, queue):
+                queued += 1
+        self.metrics.observe('scan', scan_start, time.perf_counter())
+        self.metrics.count('messages_scanned', scanned)
+        if queued:
+            print(f"{job.tag}Catch-up: queued {queued} PDFs posted after message #{min_id}")
+            
+    async def _queue_pdf_message(self, job, message, queue):
+        """Queue a PDF message for download unless it is already queued; returns True if queued"""
+        from telethon.tl.types import MessageMediaDocument
+        if not (message.media and isinstance(message.media, MessageMediaDocument)):
+            return False
+        if message.media.document.mime_type != 'application/pdf':
+            return False
+        # The live handler and the scans can both see a message
+        progress = job.progress
+        if message.id in progress.queued_message_ids:
+            return False
+        progress.queued_message_ids.add(message.id)
+        progress.in_flight_message_ids.add(message.id)
+        progress.found += 1
+        record = PdfRecord.from_message(message)
+        if not progress.record_size:
+            # Records differ only in their file name, so one measurement is enough
+            progress.record_size = record.memory_size()
+            self.metrics.set('pdf_record_bytes', progress.record_size)
+        self.metrics.count('pdfs_found')
+        await queue.put((job, progress.found, record))
+        return True
+            
+    async def _flush_idle_batch(self):
+        """Import a partial Calibre batch once nothing else is waiting (daemon mode)"""
+        if (self.calibre_batch and self._import_queue.empty() and not self._imports_running
+                and self.calibre_batch.pending):
+            loop = asyncio.get_event_loop()
+            self._record_imports(await loop.run_in_executor(None, self.calibre_batch.flush))
+            
+    async def _scan_channel(self, job, queue):
+        """Scan the channel history and queue PDF messages for download"""
+        channel, progress = job.entity, job.progress
+        print(f"{job.tag}Scanning for PDF files from {job.start_date.date()} to {job.end_date.date()}...")
+        
+        # Use offset_date to start from a day after end_date to ensure we capture all messages
+        # Then iterate backwards through all messages until we go past start_date
+        search_start = job.end_date + timedelta(days=1)
+        
+        # With incremental sync only ask Telegram for messages newer than the
+        # last checkpoint recorded in the ledger
+        min_id = 0
+        if self.incremental_sync:
+            min_id = self.ledger.get_checkpoint(channel.id)
+            if min_id:
+                print(f"{job.tag}Incremental sync: only scanning messages newer than #{min_id}")
+        
+        # Let Telegram drop text, photos, stickers etc. server-side; the PDF
+        # checks below stay in place as a safety net
+        from telethon.tl.types import InputMessagesFilterDocument
+        message_filter = InputMessagesFilterDocument if self.scan_documents_only else None
+        scope = "document messages" if message_filter else "messages"
+        
+        message_count = 0
+        found = 0
+        scan_start = time.perf_counter()
+        async for message in self._iter_history(
+            channel.peer,
+            offset_date=search_start,
+            min_id=min_id,
+            filter=message_filter
+        ):
+            message_count += 1
+            progress.newest_message_id = max(progress.newest_message_id, message.id)
+            
+            # Stop if we've gone past our start date
+            if message.date.date() < job.start_date.date():
+                break
                 
-                # Small delay to be respectful to Telegram's servers
-                await asyncio.sleep(0.5)
+            # Check if message is within our date range, then queue it if it is a PDF
+            if job.start_date.date() <= message.date.date() <= job.end_date.date():
+                if await self._queue_pdf_message(job, message, queue):
+                    found += 1
                         
-            total_time = time.time() - start_time
-            print(f"\n✅ Successfully downloaded {pdf_count} PDF files in {total_time/60:.1f} minutes!")
+            # Show progress every 100 messages
+            if message_count % 100 == 0:
+                print(f"  {job.tag}Scanned {message_count} {scope}, found {found} PDFs so far...")
+        
+        self.metrics.observe('scan', scan_start, time.perf_counter())
+        self.metrics.count('messages_scanned', message_count)
+        print(f"{job.tag}Finished scanning: fetched {message_count} {scope}, {found} matched as PDFs")
+        print(f"{job.tag}Found {found} PDF files to download")
+        if found:
+            # At most SCAN_QUEUE_SIZE of these are held at once; the rest are already downloaded
+            print(f"  {job.tag}Queued as compact records of ~{progress.record_size} bytes each "
+                  f"(at most {self.scan_queue_size} waiting at a time)")
+        progress.total = found
+        return message_count
             
-        except Exception as e:
-            print(f"Error extracting PDFs: {e}")
+    def _advance_checkpoint(self, job):
+        """Move the ledger checkpoint past every message handled in this run"""
+        # A failed download keeps the checkpoint just below it so the next
+        # incremental run picks the message up again; in daemon mode the
+        # same goes for messages still waiting in the queue
+        progress = job.progress
+        blocked = progress.failed_message_ids | progress.in_flight_message_ids
+        if blocked:
+            checkpoint = min(blocked) - 1
+        else:
+            checkpoint = progress.newest_message_id
+        
+        if checkpoint > 0:
+            self.ledger.set_checkpoint(job.entity.id, job.name, checkpoint)
+            
+    async def _download_worker(self, queue):
+        """Download queued PDF messages, from any channel, until a stop marker is received"""
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            
+            job, i, record = item
+            channel, progress = job.entity, job.progress
+            try:
+                await self._download_pdf_message(i, channel, record, job.downloads_dir, progress)
+                progress.failed_message_ids.discard(record.message_id)
+            except Exception as e:
+                progress.record('failed')
+                attempts = self.ledger.record_document(channel.id, record.message_id, record.document_id,
+                                                       record.size, None, None, 'failed')
+                print(f"{progress.label(i)} ✗ Download failed for message {record.message_id}: {e}")
+                if attempts >= self.max_download_attempts:
+                    # Stop holding the checkpoint back; it stays 'failed' in the ledger
+                    # and is fetched again by a dated run (INCREMENTAL_SYNC=false)
+                    progress.failed_message_ids.discard(record.message_id)
+                    print(f"{progress.label(i)} Giving up on message {record.message_id} after {attempts} attempts")
+                else:
+                    progress.failed_message_ids.add(record.message_id)
+                    # Let a later catch-up scan queue it again
+                    progress.queued_message_ids.discard(record.message_id)
+            finally:
+                progress.in_flight_message_ids.discard(record.message_id)
+            
+    async def _download_pdf_message(self, i, channel, record, downloads_dir, progress):
+        """Download a single PDF message and import it to Calibre"""
+        filename = record.filename
+            
+        # Create month folder
+        month_folder = downloads_dir / f"{record.date.year}-{record.date.month:02d}"
+        month_folder.mkdir(exist_ok=True)
+        
+        # Check if file already exists (a shorter file of this document means an
+        # older run left a truncated file behind, so it is downloaded again)
+        file_path = self._target_path(month_folder, record)
+        if file_path.exists() and record.size and file_path.stat().st_size < record.size:
+            print(f"{progress.label(i)} Incomplete file found ({file_path.stat().st_size} of {record.size} bytes), downloading again: {filename}")
+            file_path.unlink()
+        if file_path.exists():
+            await self._use_existing_file(i, channel, record, file_path, progress)
+            return
+        
+        # Reposts and forwards carry the same Telegram document; reuse the copy
+        # we already have instead of transferring it again. If another worker
+        # is fetching the same document right now, wait for it first (and again
+        # if it failed and yet another worker took it over meanwhile).
+        if self.dedup_documents != 'off':
+            in_flight = self._documents_in_flight.get(record.document_id)
+            while in_flight:
+                await in_flight.wait()
+                in_flight = self._documents_in_flight.get(record.document_id)
+            if await self._reuse_local_copy(i, channel, record, file_path, progress):
+                return
+        
+        # Download the file with progress
+        file_size_mb = record.size / (1024 * 1024) if record.size else 0
+        print(f"{progress.label(i)} Downloading: {filename} ({file_size_mb:.1f}MB)")
+        
+        in_flight = asyncio.Event()
+        self._documents_in_flight[record.document_id] = in_flight
+        self._paths_in_flight[file_path] = record.document_id
+        try:
+            download_start = time.time()
+            with self.metrics.timed('download'):
+                transferred = await self._fetch_document(channel, record, file_path)
+            download_time = time.time() - download_start
+        finally:
+            self._documents_in_flight.pop(record.document_id, None)
+            self._paths_in_flight.pop(file_path, None)
+            in_flight.set()
+        
+        self.metrics.count('bytes_downloaded', transferred)
+        transferred_mb = transferred / (1024 * 1024)
+        progress.record('downloaded', transferred_mb)
+        self.ledger.record_document(channel.id, record.message_id, record.document_id, record.size,
+                                    filename, file_path, 'downloaded')
+        
+        # Show download speed and ETA (based on overall throughput so it stays
+        # accurate when several downloads are in flight)
+        if download_time > 0:
+            speed_mbps = transferred_mb / download_time
+            print(f"    ✓ Downloaded {filename} in {download_time:.1f}s ({speed_mbps:.1f}MB/s) - {progress.eta_text()}")
+        
+        # Import to Calibre if enabled
+        if self.enable_calibre_import:
+            await self._queue_import(channel, record.message_id, file_path, filename)
+            
+    def _target_path(self, month_folder, record):
+        """Where a document is saved: its own file name, or the name plus its document id
+        when a different document (say, last week's issue) already has that name
+        """
+        file_path = month_folder / record.filename
+        if self._holds_other_document(file_path, record):
+            file_path = file_path.with_name(f"{file_path.stem} ({record.document_id}){file_path.suffix}")
+        return file_path
+        
+    def _holds_other_document(self, file_path, record):
+        """Whether file_path is, or is about to be, a different document than record's"""
+        downloading = self._paths_in_flight.get(file_path)
+        if downloading is not None:
+            return downloading != record.document_id
+        if not file_path.exists():
+            return False
+        owner = self.ledger.document_at(file_path)
+        if owner is not None and owner != record.document_id:
+            return True
+        # Unknown to the ledger: only a file no longer than this document can be ours
+        return bool(record.size) and file_path.stat().st_size > record.size
+        
+    async def _iter_history(self, entity, **kwargs):
+        """iter_messages paced by the rate limiter, resuming after a FloodWait instead of failing"""
+        offset_id = 0
+        from telethon import errors
+        fetched = 0
+        while True:
+            try:
+                await self.rate_limiter.acquire()
+                # wait_time=0: Telethon would otherwise sleep 1s between pages; the
+                # rate limiter is the only throttle
+                async for message in self.client.iter_messages(entity, offset_id=offset_id, wait_time=0, **kwargs):
+                    offset_id = message.id
+                    fetched += 1
+                    if fetched % HISTORY_PAGE_SIZE == 0:
+                        # The next message comes from a new request
+                        self.rate_limiter.success()
+                        await self.rate_limiter.acquire()
+                    yield message
+                self.rate_limiter.success()
+                return
+            except errors.FloodWaitError as e:
+                print(f"⏳ Telegram FloodWait: pausing requests for {e.seconds}s, then continuing the scan")
+                self._flood_wait(e.seconds)
+                # offset_id now marks where to continue; offset_date would restart from the top
+                kwargs.pop('offset_date', None)
+            
+    async def _fetch_document(self, channel, record, file_path):
+        """Download a document, waiting out FloodWaits and resuming from the .part file"""
+        from telethon import errors
+        flood_waits = 0
+        refreshed = False
+        while True:
+            try:
+                return await self._download_document(record, file_path)
+            except errors.FloodWaitError as e:
+                flood_waits += 1
+                if flood_waits == FLOOD_WAIT_RETRIES:
+                    raise
+                print(f"    ⏳ Telegram FloodWait: pausing requests for {e.seconds}s, then resuming {file_path.name}")
+                self._flood_wait(e.seconds)
+            except errors.FileReferenceExpiredError:
+                # The record was queued a while ago (daemon mode, long backfills);
+                # the message itself carries a fresh reference
+                if refreshed:
+                    raise
+                refreshed = True
+                print(f"    ↻ File reference expired, re-reading message {record.message_id} for {file_path.name}")
+                await self._refresh_file_reference(channel, record)
+                
+    async def _refresh_file_reference(self, channel, record):
+        """Fetch the record's message again and take the current file reference of its document"""
+        await self.rate_limiter.acquire()
+        message = await self.client.get_messages(channel.peer, ids=record.message_id)
+        document = getattr(getattr(message, 'media', None), 'document', None)
+        if document is None or document.id != record.document_id:
+            raise IOError(f"message {record.message_id} no longer holds the document")
+        record.file_reference = document.file_reference
+        self.rate_limiter.success()
+            
+    def _flood_wait(self, seconds):
+        """Pause all Telegram requests for a FloodWait and lower the request rate"""
+        self.rate_limiter.back_off(seconds)
+        self.metrics.count('flood_waits')
+        self.metrics.count('flood_wait_seconds', seconds)
+            
+    async def _download_document(self, record, file_path):
+        """Download into a .part file that survives interruptions, then rename it into place.
+        
+        Returns the number of bytes transferred by this call.
+        """
+        threshold = self.parallel_download_threshold_mb * 1024 * 1024
+        if self.parallel_download_connections > 1 and record.size and record.size >= threshold:
+            return await self._download_document_parallel(record, file_path)
+        
+        part_path, ranges_path = self._part_paths(record, file_path)
+        
+        # Resume from what an earlier, interrupted attempt left behind
+        offset = 0
+        if part_path.exists():
+            offset = part_path.stat().st_size
+            if ranges_path.exists():
+                # Left by a parallel download: only its leading run of finished ranges is usable
+                done = self._load_finished_ranges(ranges_path)
+                offset = 0
+                while offset // PARALLEL_RANGE_SIZE in done:
+                    offset += PARALLEL_RANGE_SIZE
+                offset = min(offset, part_path.stat().st_size)
+                ranges_path.unlink()
+            if record.size and offset > record.size:
+                offset = 0
+            offset -= offset % DOWNLOAD_REQUEST_SIZE
+            os.truncate(part_path, offset)
+            if offset:
+                print(f"    ↻ Resuming {file_path.name} from {offset / (1024 * 1024):.1f}MB")
+        
+        limit = None
+        if record.size:
+            limit = -(-(record.size - offset) // DOWNLOAD_REQUEST_SIZE)  # Requests still needed
+        
+        # Starting the stream takes a request token; its chunks only wait out
+        # FloodWait pauses, so the token bucket never caps the transfer rate
+        with open(part_path, 'ab') as f:
+            await self.rate_limiter.acquire()
+            async for chunk in self.client.iter_download(
+                record.location(),
+                offset=offset,
+                limit=limit,
+                request_size=DOWNLOAD_REQUEST_SIZE,
+                file_size=record.size,
+                dc_id=record.dc_id
+            ):
+                f.write(chunk)
+                await self.rate_limiter.paused()
+        self.rate_limiter.success()
+        
+        received = part_path.stat().st_size
+        if record.size and received != record.size:
+            raise IOError(f"incomplete download ({received} of {record.size} bytes), will resume next run")
+        os.replace(part_path, file_path)
+        return received - offset
+            
+    def _part_paths(self, record, file_path):
+        """The .part and .part.ranges files of one document's download into file_path
+        
+        Named after the document as well as the file, so two documents that
+        share a file name in the same month folder never write to the same
+        partial file.
+        """
+        stem = f"{file_path.name}.{record.document_id}.part"
+        return file_path.with_name(stem), file_path.with_name(stem + '.ranges')
+        
+    async def _download_document_parallel(self, record, file_path):
+        """Fetch byte ranges of one large document over several connections at once.
+        
+        Each range is written at its own offset into a preallocated .part file;
+        finished ranges are listed in a .part.ranges file so an interrupted
+        download only refetches the ranges that were still missing.
+        """
+        part_path, ranges_path = self._part_paths(record, file_path)
+        size = record.size
+        range_count = -(-size // PARALLEL_RANGE_SIZE)
+        
+        done = set()
+        if part_path.exists():
+            if ranges_path.exists():
+                done = self._load_finished_ranges(ranges_path)
+            else:
+                # Left by a sequential download: every range it fully covers is usable
+                done = set(range(min(part_path.stat().st_size, size) // PARALLEL_RANGE_SIZE))
+        if done:
+            print(f"    ↻ Resuming {file_path.name}: {len(done)}/{range_count} ranges already downloaded")
+        
+        # Write the range list before preallocating, so a full-size .part is
+        # never mistaken for a finished sequential download
+        self._save_finished_ranges(ranges_path, done)
+        with open(part_path, 'ab'):
+            pass
+        os.truncate(part_path, size)  # Preallocate so every range can be written in place
+        
+        location = record.location()
+        pending = asyncio.Queue()
+        for index in range(range_count):
+            if index not in done:
+                pending.put_nowait(index)
+        transferred = 0
+        
+        fd = os.open(part_path, os.O_WRONLY)
+        try:
+            async def fetch_ranges():
+                nonlocal transferred
+                while not pending.empty():
+                    index = pending.get_nowait()
+                    start = index * PARALLEL_RANGE_SIZE
+                    length = min(PARALLEL_RANGE_SIZE, size - start)
+                    position = start
+                    await self.rate_limiter.acquire()
+                    async for chunk in self.client.iter_download(
+                        location,
+                        offset=start,
+                        limit=-(-length // DOWNLOAD_REQUEST_SIZE),
+                        request_size=DOWNLOAD_REQUEST_SIZE,
+                        file_size=size,
+                        dc_id=record.dc_id
+                    ):
+                        chunk = chunk[:start + length - position]
+                        os.pwrite(fd, chunk, position)
+                        position += len(chunk)
+                        await self.rate_limiter.paused()
+                    self.rate_limiter.success()
+                    if position != start + length:
+                        raise IOError(f"range {index} incomplete ({position - start} of {length} bytes)")
+                    transferred += length
+                    done.add(index)
+                    self._save_finished_ranges(ranges_path, done)
+            
+            connections = min(self.parallel_download_connections, max(pending.qsize(), 1))
+            fetchers = [asyncio.ensure_future(fetch_ranges()) for _ in range(connections)]
+            try:
+                await asyncio.gather(*fetchers)
+            except BaseException:
+                # Stop the other connections before the file is closed under them
+                for fetcher in fetchers:
+                    fetcher.cancel()
+                await asyncio.gather(*fetchers, return_exceptions=True)
+                raise
+        finally:
+            os.close(fd)
+        
+        if len(done) != range_count:
+            raise IOError(f"incomplete download ({len(done)} of {range_count} ranges), will resume next run")
+        os.replace(part_path, file_path)
+        if ranges_path.exists():
+            ranges_path.unlink()
+        return transferred
+            
+    def _load_finished_ranges(self, ranges_path):
+        """Read the finished range numbers of an interrupted parallel download"""
+        try:
+            with open(ranges_path, 'r') as f:
+                return set(json.load(f))
+        except (OSError, ValueError):
+            return set()
+            
+    def _save_finished_ranges(self, ranges_path, done):
+        """Atomically record which ranges of a parallel download are finished"""
+        temp_path = ranges_path.with_name(ranges_path.name + '.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump(sorted(done), f)
+        os.replace(temp_path, ranges_path)
+            
+    async def _use_existing_file(self, i, channel, record, file_path, progress):
+        """Count a PDF that is already in the download folder, and still import it"""
+        filename = record.filename
+        print(f"{progress.label(i)} File exists: {filename}")
+        self.ledger.record_document(channel.id, record.message_id, record.document_id, record.size,
+                                    filename, file_path, 'existing')
+        # Still try to import to Calibre if enabled
+        if self.enable_calibre_import:
+            await self._queue_import(channel, record.message_id, file_path, filename)
+        progress.record('existing')
+        
+    async def _reuse_local_copy(self, i, channel, record, file_path, progress):
+        """Satisfy a download from an earlier copy of the same document, if there is one"""
+        filename = record.filename
+        known_path = self.ledger.find_local_copy(record.document_id, record.size)
+        if not known_path:
+            return False
+        
+        # A repost with the same name that was downloaded while this one waited
+        # already is the copy (find_local_copy then returns file_path itself)
+        if file_path.exists() and file_path.stat().st_size == record.size:
+            await self._use_existing_file(i, channel, record, file_path, progress)
+            return True
+        
+        if self.dedup_documents == 'skip':
+            print(f"{progress.label(i)} Same document already downloaded as {known_path}, skipping: {filename}")
+            self.ledger.record_document(channel.id, record.message_id, record.document_id, record.size,
+                                        filename, known_path, 'duplicate')
+            progress.record('deduplicated')
+            return True
+        
+        try:
+            os.link(known_path, file_path)
+        except OSError:
+            # Hardlinks need the same filesystem; a local copy still saves the transfer
+            shutil.copy2(known_path, file_path)
+        print(f"{progress.label(i)} Reused local copy: {filename} (same document as {known_path})")
+        self.ledger.record_document(channel.id, record.message_id, record.document_id, record.size,
+                                    filename, file_path, 'linked')
+        progress.record('deduplicated')
+        
+        if self.enable_calibre_import:
+            await self._queue_import(channel, record.message_id, file_path, filename)
+        return True
+            
+    async def _queue_import(self, channel, message_id, file_path, filename):
+        """Hand a downloaded PDF over to the Calibre import stage"""
+        await self._import_queue.put((channel.id, message_id, file_path, filename))
+            
+    async def _import_worker(self):
+        """Import queued PDFs to Calibre in a worker thread until a stop marker is received"""
+        loop = asyncio.get_event_loop()
+        while True:
+            item = await self._import_queue.get()
+            if item is None:
+                return
+            
+            channel_id, message_id, file_path, filename = item
+            self._imports_running += 1  # Keeps the daemon from merging a half-imported book
+            try:
+                with self.metrics.timed('calibre_import'):
+                    finished = await loop.run_in_executor(
+                        None, self._import_pdf, channel_id, message_id, file_path, filename
+                    )
+            except Exception as e:
+                print(f"    ✗ Calibre import failed for {filename}: {e}")
+                self.ledger.record_import(channel_id, message_id, False)
+                self.metrics.count('calibre_failed')
+                continue
+            finally:
+                self._imports_running -= 1
+            self._record_imports(finished)
+            
+    async def _finish_imports(self, import_workers):
+        """Wait for the Calibre import stage to drain, then import the last partial batch"""
+        if not import_workers:
+            return
+        pending = self._import_queue.qsize()
+        if pending:
+            print(f"Downloads finished, waiting for {pending} Calibre imports...")
+        for _ in import_workers:
+            await self._import_queue.put(None)  # One stop marker per worker
+        await asyncio.gather(*import_workers)
+        if self.calibre_batch:
+            loop = asyncio.get_event_loop()
+            self._record_imports(await loop.run_in_executor(None, self.calibre_batch.flush))
+            
+    def _import_pdf(self, channel_id, message_id, file_path, filename):
+        """Import a PDF to Calibre, either directly or through the current batch.
+        
+        Runs in a worker thread, so it only returns the finished items; the
+        ledger is updated back on the event loop.
+        """
+        title, published_date, series = self._extract_metadata_from_filename(filename)
+        key = (channel_id, message_id)
+        if self._already_in_library(title, series):
+            print(f"    ⏭ Already in Calibre: {title}")
+            item = BatchItem(file_path, title, published_date, series, key=key)
+            item.success = True
+            item.present = True
+            return [item]
+        
+        self.import_limiter.wait()
+        if self.calibre_batch:
+            return self.calibre_batch.add(file_path, title, published_date, series, key=key)
+        
+        item = BatchItem(file_path, title, published_date, series, key=key)
+        item.success = self._import_to_calibre(file_path, title, published_date, series)
+        if item.success:
+            self.import_limiter.success()
+        return [item]
+            
+    def _record_imports(self, items):
+        """Store the outcome of finished imports in the ledger and library index"""
+        for item in items:
+            channel_id, message_id = item.key
+            self.ledger.record_import(channel_id, message_id, item.success, present=item.present)
+            if item.present:
+                self.metrics.count('calibre_present')
+            elif item.success:
+                self.metrics.count('calibre_imported')
+                self._remember_import(item.title, item.series, item.published_date)
+            else:
+                self.metrics.count('calibre_failed')
+            
+    def _remember_import(self, title, series, published_date):
+        """Add a freshly imported book to the library index"""
+        if self.library_index:
+            self.library_index.add(title, series, published_date)
             
     async def run(self):
         """Main execution method"""
         print("Telegram PDF Extractor")
         print("=" * 30)
+        self.startup_times = []
         
         # Get user input for missing environment variables
+        settings_start = time.perf_counter()
         self.get_user_input()
+        self._startup_step('settings', settings_start)
         
-        # Connect to Telegram
+        # Connect to Telegram. Without a terminal (cron, systemd) nobody can
+        # answer a prompt, so the Calibre check runs in a thread meanwhile;
+        # interactive runs keep the prompts apart by checking Calibre first.
+        calibre_check = None
+        if self.enable_calibre_import:
+            if sys.stdin.isatty():
+                self._prepare_calibre()
+            else:
+                calibre_check = asyncio.get_event_loop().run_in_executor(None, self._prepare_calibre)
+        connect_start = time.perf_counter()
         await self.connect_to_telegram()
+        self._startup_step('Telegram connect', connect_start)
+        if calibre_check:
+            await calibre_check
+        
+        # Optional profiling (CPU, allocations, event loop stalls), written next to the logs
+        profiler = None
+        if self.profile_run:
+            profiler = RunProfiler('extractor', self.run_report_dir, self.profile_stall_ms)
+            profiler.start()
         
-        # Extract PDFs
-        await self.extract_pdfs()
+        # Extract PDFs, or keep running and follow the channel
+        if self.daemon_mode:
+            await self.run_daemon()
+        else:
+            await self.extract_pdfs()
+        
+        if profiler:
+            profiler.finish()
         
         # Disconnect
         await self.client.disconnect()
         print("Disconnected from Telegram")
+        
+        if self.ledger:
+            self.ledger.close()
+        
+        self._write_run_report()
+        
+    def _prepare_calibre(self):
+        """Check that the Calibre library is usable and index its books"""
+        calibre_start = time.perf_counter()
+        self._check_calibre_status()
+        self._load_library_index()
+        self._prepare_staging()
+        self._startup_step('Calibre check', calibre_start)
+        
+    def _prepare_staging(self):
+        """Send imports to a local staging library when the Calibre library is on network storage"""
+        if self.calibre_staging == 'never':
+            return
+        if self.calibre_staging == 'auto' and not self._is_network_path(os.path.expanduser(self.calibre_library_path)):
+            return
+        staging = StagingLibrary(
+            self.calibre_staging_path, self.calibre_library_path, self.calibre_cli_path,
+            backend=self.calibre_import_backend, metrics=self.metrics, limiter=self.import_limiter,
+            fallback=partial(self._import_to_calibre, library_path=self.calibre_library_path)
+        )
+        if not staging.prepare():
+            print(f"⚠ Could not create a staging library in {staging.path}, importing into the library directly")
+            return
+        self.staging = staging
+        waiting = len(staging.staged_books())
+        print(f"📥 Staging imports in {staging.path}, merged into the Calibre library in one step"
+              + (f" ({waiting} books still staged from an earlier run)" if waiting else ''))
+        
+    def _import_library_path(self):
+        """Where imports go: the staging library while staging, otherwise the Calibre library"""
+        return str(self.staging.path) if self.staging else self.calibre_library_path
+        
+    async def _merge_staging(self):
+        """Merge the staged imports into the Calibre library, leaving failures staged"""
+        if not self.staging:
+            return
+        loop = asyncio.get_event_loop()
+        try:
+            await loop.run_in_executor(None, self.staging.merge)
+        except Exception as e:
+            print(f"Warning: Could not merge the staging library, its books stay staged: {e}")
+        
+    def _startup_step(self, step, start, note=None):
+        """Record how long a startup step took, for the breakdown and the run report"""
+        end = time.perf_counter()
+        self.metrics.observe(f"startup_{step.lower().replace(' ', '_')}", start, end)
+        if self.startup_times is not None:
+            self.startup_times.append((step, start, end, note))
+        
+    def _print_startup_times(self):
+        """Print where the time before the first scan went, once per run"""
+        if not self.startup_times:
+            return
+        first_start = min(start for _, start, _, _ in self.startup_times)
+        last_end = max(end for _, _, end, _ in self.startup_times)
+        parts = []
+        for step, start, end, note in self.startup_times:
+            details = [note] if note else []
+            if step == 'Calibre check' and any(
+                    other == 'Telegram connect' and start < other_end and other_start < end
+                    for other, other_start, other_end, _ in self.startup_times):
+                details.append('during connect')
+            parts.append(f"{step} {end - start:.2f}s" + (f" ({', '.join(details)})" if details else ''))
+        print(f"⏱ Startup {last_end - first_start:.2f}s: {', '.join(parts)}")
+        self.startup_times = None
+        
+    def _write_run_report(self, quiet=False):
+        """Write the run's counters and timings as JSON and as a Prometheus textfile"""
+        if not self.run_report:
+            return
+        # Download outcomes are tallied per channel by the progress counters
+        progress = [job.progress for job in self.channels if job.progress]
+        for outcome in ['downloaded', 'existing', 'deduplicated', 'failed']:
+            self.metrics.set(f'pdfs_{outcome}', sum(getattr(p, outcome) for p in progress))
+        self.metrics.set('rate_limited_seconds', round(self.rate_limiter.waited_seconds, 3))
+        self.metrics.set('telegram_requests_per_second', round(self.rate_limiter.rate, 2))
+        self.metrics.set('calibre_imports_per_second', round(self.import_limiter.rate, 2))
+        try:
+            report_path, prom_path = self.metrics.write(self.run_report_dir, self.metrics_textfile_dir)
+        except OSError as e:
+            print(f"Warning: Could not write run report: {e}")
+            return
+        if not quiet:
+            print(f"📊 Run report: {report_path} (Prometheus: {prom_path})")
 
 async def main():
     extractor = TelegramPDFExtractor()
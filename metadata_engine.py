@@ -0,0 +1,164 @@
+import re
+from datetime import datetime
+from pathlib import Path
+
+# Tried in order; the first pattern whose match parses as a date wins.
+# (regex, strptime format, what to fill in for the missing parts)
+DATE_PATTERNS = [
+    # Full dates
+    (re.compile(r'(\d{4}-\d{2}-\d{2})'), '%Y-%m-%d', None),  # YYYY-MM-DD
+    (re.compile(r'(\d{4}_\d{2}_\d{2})'), '%Y_%m_%d', None),  # YYYY_MM_DD
+    (re.compile(r'(\d{2}-\d{2}-\d{4})'), '%d-%m-%Y', None),  # DD-MM-YYYY
+    (re.compile(r'(\d{2}_\d{2}_\d{4})'), '%d_%m_%Y', None),  # DD_MM_YYYY
+    # Partial dates (year-month only) -> first day of the month
+    (re.compile(r'(\d{4}-\d{2})'), '%Y-%m', {'day': 1}),     # YYYY-MM
+    (re.compile(r'(\d{4}_\d{2})'), '%Y_%m', {'day': 1}),     # YYYY_MM
+    # Year only -> January 1st
+    (re.compile(r'(\d{4})'), '%Y', {'month': 1, 'day': 1}),  # YYYY
+]
+
+# Every date pattern contains four digits in a row, so names without them
+# can skip the whole list
+HAS_YEAR = re.compile(r'\d{4}')
+
+DOCUMENT_SUFFIXES = ['_document', '_doc', '_file', '_pdf']
+
+
+class SeriesMatcher:
+    """Aho-Corasick automaton over the lowercased series_mapping keys
+
+    Finds the first key (in mapping order) contained in a filename with one
+    pass over the filename, however many keys the mapping has. Gives the same
+    answer as checking `key.lower() in filename.lower()` key by key.
+    """
+
+    def __init__(self, keys):
+        self.goto = [{}]
+        self.fail = [0]
+        self.first = [None]  # Lowest key index ending at (or suffix-reachable from) each node
+        self.empty_key = None  # An empty key is contained in every filename
+
+        for index, key in enumerate(keys):
+            key = key.lower()
+            if not key:
+                if self.empty_key is None:
+                    self.empty_key = index
+                continue
+            node = 0
+            for char in key:
+                next_node = self.goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self.goto)
+                    self.goto[node][char] = next_node
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.first.append(None)
+                node = next_node
+            if self.first[node] is None:
+                self.first[node] = index
+
+        # Breadth-first pass to set failure links and fold each node's
+        # suffix matches into its lowest index
+        queue = list(self.goto[0].values())
+        for node in queue:
+            for char, child in self.goto[node].items():
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                inherited = self.first[self.fail[child]]
+                if inherited is not None and (self.first[child] is None or inherited < self.first[child]):
+                    self.first[child] = inherited
+                queue.append(child)
+
+    def find(self, text):
+        """Return the index of the first key contained in text, or None"""
+        best = self.empty_key
+        if best == 0:
+            return best
+        goto, fail, first = self.goto, self.fail, self.first
+        node = 0
+        for char in text.lower():
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            index = first[node]
+            if index is not None and (best is None or index < best):
+                best = index
+                if best == 0:
+                    break
+        return best
+
+
+class MetadataExtractor:
+    """Precompiled title/date/series extraction for PDF filenames"""
+
+    def __init__(self, series_mapping=None):
+        self.series_mapping = series_mapping if series_mapping is not None else {}
+        self.series_names = list(self.series_mapping.values())
+        self.matcher = SeriesMatcher(self.series_mapping.keys())
+
+    def extract(self, filename, default_date=None):
+        """Return (title, published_date, series) for a filename.
+
+        published_date is default_date when the name carries no usable date.
+        """
+        # Title is the filename without extension
+        name_without_ext = Path(filename).stem
+        title = name_without_ext
+
+        published_date, date_match = self._find_date(name_without_ext)
+        if not published_date:
+            published_date = default_date
+
+        # First, try to find series from predefined mapping
+        series = None
+        index = self.matcher.find(filename)
+        if index is not None:
+            series = self.series_names[index]
+
+        # If no mapping found and we have a date match, extract series from filename before the date
+        if not series and date_match:
+            before_date = name_without_ext[:date_match.start()].strip().rstrip('-_. ')
+            if before_date:
+                series = before_date
+        elif not series:
+            # If no date match and no mapping, try to extract series from the whole filename
+            # Remove common document-like suffixes
+            clean_name = name_without_ext
+            for suffix in DOCUMENT_SUFFIXES:
+                if clean_name.lower().endswith(suffix):
+                    clean_name = clean_name[:-len(suffix)]
+                    break
+
+            if clean_name and clean_name != name_without_ext:
+                series = clean_name
+
+        return title, published_date, series
+
+    def extract_many(self, filenames, default_date=None):
+        """Extract metadata for many filenames at once; returns a list of tuples"""
+        extract = self.extract
+        return [extract(filename, default_date) for filename in filenames]
+
+    def _find_date(self, name):
+        """Return (date, match) for the first pattern that parses.
+
+        The match of the last pattern tried is returned even when none parsed,
+        because the series fallback cuts the name at it.
+        """
+        if not HAS_YEAR.search(name):
+            return None, None
+        date_match = None
+        for pattern, date_format, fill in DATE_PATTERNS:
+            match = pattern.search(name)
+            if match:
+                date_match = match
+                try:
+                    parsed_date = datetime.strptime(match.group(1), date_format)
+                except ValueError:
+                    continue
+                if fill:
+                    parsed_date = parsed_date.replace(**fill)
+                return parsed_date.date(), date_match
+        return None, date_match
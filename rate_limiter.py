@@ -0,0 +1,81 @@
+import asyncio
+import threading
+import time
+
+
+class AdaptiveRateLimiter:
+    """Token bucket that slows down when the other side pushes back and speeds up while it does not
+
+    Callers take a token before each request (acquire() from the event loop,
+    wait() from threads). Streams that are already paced by the other side,
+    such as the chunks of a file download, only honour pauses (paused()).
+    back_off() is called on a FloodWait or a locked database: everyone pauses
+    for the requested time and the rate is halved.
+    After recover_seconds without push-back, every success() raises the rate
+    by a twentieth of the starting rate, up to max_rate.
+    """
+
+    def __init__(self, rate, min_rate=0.5, max_rate=None, burst=None, recover_seconds=30):
+        self.start_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.max_rate = max_rate or rate * 4
+        self.burst = burst or max(rate, 1)
+        self.recover_seconds = recover_seconds
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.last_back_off = None
+        self.waited_seconds = 0.0  # Time callers spent waiting for a token or a pause
+        self.back_offs = 0
+        self.lock = threading.Lock()
+
+    def _reserve(self):
+        """Take a token, going into debt if none is left; returns how long to wait before using it"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            delay = max(self.paused_until - now, -self.tokens / self.rate, 0.0)
+            self.waited_seconds += delay
+            return delay
+
+    async def acquire(self):
+        """Wait (without blocking the event loop) until a request may be sent"""
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def paused(self):
+        """Wait out a back_off() pause, without taking a token"""
+        with self.lock:
+            delay = max(self.paused_until - time.monotonic(), 0.0)
+            self.waited_seconds += delay
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def wait(self):
+        """Block the calling thread until a request may be sent"""
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def success(self):
+        """A request went through without push-back"""
+        with self.lock:
+            if self.rate >= self.max_rate:
+                return
+            if self.last_back_off is not None and time.monotonic() - self.last_back_off < self.recover_seconds:
+                return
+            self.rate = min(self.max_rate, self.rate + self.start_rate / 20)
+
+    def back_off(self, pause_seconds=0):
+        """The other side asked us to slow down: pause every caller and halve the rate"""
+        with self.lock:
+            now = time.monotonic()
+            self.paused_until = max(self.paused_until, now + pause_seconds)
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0)
+            self.last_back_off = now
+            self.back_offs += 1
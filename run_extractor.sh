@@ -38,5 +38,6 @@ echo "" >> "$LOG_FILE"
 
 # Keep only last 30 days of logs
 find logs -name "extractor_*.log" -mtime +30 -delete
+find logs -name "extractor_profile_*" -mtime +30 -delete
 
 echo "PDF extraction completed. Check $LOG_FILE for details."
\ No newline at end of file
@@ -0,0 +1,156 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+METRIC_PREFIX = 'pdf_extractor'
+
+# HELP lines for the Prometheus file; names not listed here get a generic one
+DESCRIPTIONS = {
+    'messages_scanned': 'Channel messages fetched while scanning',
+    'pdfs_found': 'PDF messages queued for download',
+    'pdf_record_bytes': 'Bytes of the compact record kept per queued PDF message',
+    'pdfs_downloaded': 'PDFs transferred from Telegram',
+    'pdfs_existing': 'PDFs already present in the download folder',
+    'pdfs_deduplicated': 'PDFs satisfied from an earlier copy of the same document',
+    'pdfs_failed': 'PDF downloads that failed',
+    'bytes_downloaded': 'Bytes transferred from Telegram',
+    'files_found': 'PDF files found in the source folder that needed processing',
+    'files_unchanged': 'Files skipped because the scan cache knew them',
+    'files_unreadable': 'Files that could not be read',
+    'calibre_imported': 'Books imported to Calibre',
+    'calibre_present': 'Books skipped because they were already in the library',
+    'calibre_failed': 'Calibre imports that failed',
+    'lock_retries': 'Calibre imports retried because the database was locked',
+    'backoff_seconds': 'Seconds slept before retrying a Calibre import',
+    'flood_waits': 'FloodWait errors returned by Telegram',
+    'flood_wait_seconds': 'Seconds Telegram asked us to wait',
+    'rate_limited_seconds': 'Seconds requests waited for the rate limiter',
+    'telegram_requests_per_second': 'Request rate the limiter had reached',
+    'calibre_imports_per_second': 'Calibre import rate the limiter had reached',
+    'staging_merged': 'Staged books merged into the Calibre library',
+}
+
+
+class RunMetrics:
+    """Counters and timings of one run, written as JSON and as a Prometheus textfile
+
+    Every timed operation keeps its count, total, slowest call and the span
+    from its first start to its last end, which is the stage's wall time even
+    when calls overlap. Safe to use from the import worker threads.
+    """
+
+    def __init__(self, script):
+        self.script = script
+        self.started_at = datetime.now()
+        self.start = time.perf_counter()
+        self.counters = {}
+        self.timings = {}  # name -> [count, total_seconds, max_seconds, first_start, last_end]
+        self.lock = threading.Lock()
+
+    def count(self, name, amount=1):
+        """Add to a counter"""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set(self, name, value):
+        """Set a counter that is tallied elsewhere (e.g. by the download progress)"""
+        with self.lock:
+            self.counters[name] = value
+
+    @contextmanager
+    def timed(self, name):
+        """Time the block as one call of the named operation"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, start, time.perf_counter())
+
+    def observe(self, name, start, end):
+        """Record one call of an operation that ran from start to end (perf_counter values)"""
+        seconds = end - start
+        with self.lock:
+            timing = self.timings.get(name)
+            if timing is None:
+                self.timings[name] = [1, seconds, seconds, start, end]
+                return
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds)
+            timing[3] = min(timing[3], start)
+            timing[4] = max(timing[4], end)
+
+    def snapshot(self):
+        """The report as a JSON-friendly dict"""
+        with self.lock:
+            counters = dict(self.counters)
+            timings = {
+                name: {
+                    'count': count,
+                    'total_seconds': round(total, 6),
+                    'average_seconds': round(total / count, 6),
+                    'max_seconds': round(longest, 6),
+                    'wall_seconds': round(last_end - first_start, 6),
+                }
+                for name, (count, total, longest, first_start, last_end) in self.timings.items()
+            }
+        return {
+            'script': self.script,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'duration_seconds': round(time.perf_counter() - self.start, 3),
+            'counters': counters,
+            'timings': timings,
+        }
+
+    def write(self, report_dir, textfile_dir=None):
+        """Write <script>_report.json to report_dir and <script>.prom to textfile_dir (default: report_dir)"""
+        report = self.snapshot()
+        report_path = Path(report_dir) / f"{self.script}_report.json"
+        prom_path = Path(textfile_dir or report_dir) / f"{self.script}.prom"
+        _write_atomic(report_path, json.dumps(report, indent=2) + '\n')
+        _write_atomic(prom_path, self._prometheus_text(report))
+        return report_path, prom_path
+
+    def _prometheus_text(self, report):
+        """Render the report in the Prometheus text exposition format"""
+        label = f'script="{self.script}"'
+        lines = []
+
+        def gauge(name, help_text, samples):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} gauge")
+            for labels, value in samples:
+                lines.append(f"{METRIC_PREFIX}_{name}{{{labels}}} {value}")
+
+        gauge('last_run_timestamp_seconds', 'Unix time the last run wrote this file', [(label, round(time.time()))])
+        gauge('last_run_duration_seconds', 'Wall time of the last run', [(label, report['duration_seconds'])])
+        for name, value in sorted(report['counters'].items()):
+            gauge(name, DESCRIPTIONS.get(name, name.replace('_', ' ')) + ' in the last run', [(label, value)])
+
+        timings = sorted(report['timings'].items())
+        if timings:
+            help_suffix = 'of each operation in the last run'
+            for field, name, help_text in [
+                ('count', 'operation_calls', 'Calls'),
+                ('total_seconds', 'operation_seconds', 'Seconds spent in all calls'),
+                ('max_seconds', 'operation_seconds_max', 'Slowest call'),
+                ('wall_seconds', 'operation_wall_seconds', 'First start to last end'),
+            ]:
+                gauge(name, f"{help_text} {help_suffix}", [
+                    (f'{label},operation="{operation}"', timing[field]) for operation, timing in timings
+                ])
+        return '\n'.join(lines) + '\n'
+
+
+def _write_atomic(path, text):
+    """Replace a file in one step, so the textfile collector never reads half of it"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    with open(temp_path, 'w') as f:
+        f.write(text)
+    os.replace(temp_path, path)
@@ -0,0 +1,164 @@
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 20
+TOP_STALLS = 20
+STACK_DEPTH = 12
+
+
+class RunProfiler:
+    """Opt-in CPU, allocation and event-loop stall profiling of one run
+
+    cProfile covers the thread that starts the profiler (the event loop in
+    main.py); time spent in worker threads shows up there as waiting.
+    Stalls are found by a heartbeat task on the event loop: when it wakes up
+    late, something blocked the loop, and a watchdog thread grabs the loop
+    thread's stack while the block is still going on.
+    """
+
+    def __init__(self, script, report_dir='logs', stall_threshold_ms=100):
+        self.script = script
+        self.report_dir = Path(report_dir)
+        self.stall_threshold = stall_threshold_ms / 1000
+        self.profile = cProfile.Profile()
+        self.started_at = None
+        self.start_time = None
+        self.duration = None
+        self.peak_memory = 0
+        self.memory_snapshot = None
+        self.stalls = []  # (time it began, seconds, stack lines or None)
+        self.loop = None
+        self._heartbeat_task = None
+        self._watchdog = None
+        self._stopped = threading.Event()
+        self._loop_thread_id = None
+        self._last_beat = None
+        self._stall_stack = None
+
+    def start(self):
+        """Start profiling; stall detection runs when called from inside the event loop"""
+        self.started_at = datetime.now()
+        self.start_time = time.perf_counter()
+        tracemalloc.start(STACK_DEPTH)
+        try:
+            self.loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.loop = None  # The folder importer has no event loop
+        if self.loop:
+            self._loop_thread_id = threading.get_ident()
+            self._last_beat = time.perf_counter()
+            self._heartbeat_task = asyncio.ensure_future(self._heartbeat())
+            self._watchdog = threading.Thread(target=self._watch, name='loop-stall-watchdog', daemon=True)
+            self._watchdog.start()
+        self.profile.enable()
+
+    def stop(self):
+        """Stop every probe; the results stay available for write()"""
+        self.profile.disable()
+        self.duration = time.perf_counter() - self.start_time
+        self._stopped.set()
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+        if self._watchdog:
+            self._watchdog.join()
+        self.peak_memory = tracemalloc.get_traced_memory()[1]
+        self.memory_snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+    def finish(self):
+        """Stop profiling, write the reports and say where they are"""
+        self.stop()
+        try:
+            paths = self.write()
+        except OSError as e:
+            print(f"Warning: Could not write profile: {e}")
+            return
+        print(f"🔬 Profile: {paths[0]} (pstats data: {paths[1]})")
+
+    async def _heartbeat(self):
+        """Wake up every few milliseconds and record how late each wake-up was"""
+        interval = self.stall_threshold / 2
+        while True:
+            expected = time.perf_counter() + interval
+            await asyncio.sleep(interval)
+            now = time.perf_counter()
+            late = now - expected
+            if late >= self.stall_threshold:
+                self.stalls.append((now - late, late, self._stall_stack))
+            self._stall_stack = None
+            self._last_beat = now
+
+    def _watch(self):
+        """Capture the loop thread's stack while it is blocked"""
+        interval = self.stall_threshold / 2
+        while not self._stopped.wait(self.stall_threshold / 4):
+            blocked_for = time.perf_counter() - self._last_beat - interval
+            if blocked_for >= self.stall_threshold and self._stall_stack is None:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    self._stall_stack = traceback.format_list(_callback_frames(frame)[-STACK_DEPTH:])
+
+    def write(self):
+        """Write <script>_profile_<time>.txt (readable summary) and .prof (for pstats/snakeviz)"""
+        self.report_dir.mkdir(parents=True, exist_ok=True)
+        stem = f"{self.script}_profile_{self.started_at:%Y%m%d_%H%M%S}"
+        text_path = self.report_dir / f"{stem}.txt"
+        prof_path = self.report_dir / f"{stem}.prof"
+        self.profile.dump_stats(str(prof_path))
+        with open(text_path, 'w') as f:
+            f.write(f"Profile of the {self.script} run started {self.started_at:%Y-%m-%d %H:%M:%S}, "
+                    f"{self.duration:.1f}s\n\n")
+            self._write_stalls(f)
+            self._write_cpu(f)
+            self._write_memory(f)
+        return text_path, prof_path
+
+    def _write_stalls(self, f):
+        if not self.loop:
+            return
+        threshold_ms = self.stall_threshold * 1000
+        f.write(f"== Event loop stalls over {threshold_ms:.0f}ms ==\n")
+        if not self.stalls:
+            f.write("None\n\n")
+            return
+        total = sum(seconds for _, seconds, _ in self.stalls)
+        f.write(f"{len(self.stalls)} stalls, {total:.2f}s in total\n")
+        longest = sorted(self.stalls, key=lambda stall: stall[1], reverse=True)[:TOP_STALLS]
+        for began, seconds, stack in longest:
+            f.write(f"\n+{began - self.start_time:.2f}s into the run: loop blocked for {seconds * 1000:.0f}ms\n")
+            f.write(''.join(stack) if stack else "  (ended before its stack could be captured)\n")
+        f.write("\n")
+
+    def _write_cpu(self, f):
+        f.write(f"== CPU: top {TOP_FUNCTIONS} functions by cumulative time ==\n")
+        output = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=output)
+        stats.strip_dirs().sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+        f.write(output.getvalue())
+        f.write("\n")
+
+    def _write_memory(self, f):
+        f.write(f"== Memory: peak {self.peak_memory / (1024 * 1024):.1f}MB traced; "
+                f"top {TOP_ALLOCATIONS} allocation sites still live at the end ==\n")
+        for stat in self.memory_snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+            f.write(f"{stat}\n")
+
+
+def _callback_frames(frame):
+    """The stack of frame without the event loop's own frames above the running callback"""
+    stack = traceback.extract_stack(frame)
+    for index in range(len(stack) - 1, -1, -1):
+        if stack[index].filename.endswith(os.path.join('asyncio', 'events.py')):
+            return stack[index + 1:]
+    return stack
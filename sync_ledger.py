@@ -0,0 +1,185 @@
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+
+class SyncLedger:
+    """Durable record of what has been scanned and downloaded per channel"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS channels (
+            channel_id INTEGER PRIMARY KEY,
+            channel_name TEXT,
+            last_message_id INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT
+        );
+        CREATE TABLE IF NOT EXISTS documents (
+            channel_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            document_id INTEGER,
+            size INTEGER,
+            filename TEXT,
+            file_path TEXT,
+            status TEXT NOT NULL,
+            import_status TEXT,
+            updated_at TEXT,
+            failed_attempts INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (channel_id, message_id)
+        );
+        CREATE INDEX IF NOT EXISTS documents_by_document_id ON documents (document_id, size);
+        CREATE INDEX IF NOT EXISTS documents_by_file_path ON documents (file_path);
+        CREATE TABLE IF NOT EXISTS channel_entities (
+            name TEXT PRIMARY KEY,
+            channel_id INTEGER NOT NULL,
+            access_hash INTEGER NOT NULL,
+            title TEXT,
+            updated_at TEXT
+        );
+    """
+
+    def __init__(self, path='sync_ledger.db'):
+        self.path = Path(path).expanduser()
+        self.conn = sqlite3.connect(str(self.path), timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(self.SCHEMA)
+        # Ledgers written before failed downloads were counted
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(documents)')]
+        if 'failed_attempts' not in columns:
+            with self.conn:
+                self.conn.execute('ALTER TABLE documents ADD COLUMN failed_attempts INTEGER NOT NULL DEFAULT 0')
+
+    def close(self):
+        """Close the ledger database"""
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+    def get_checkpoint(self, channel_id):
+        """Return the highest fully processed message id for a channel (0 if none)"""
+        row = self.conn.execute(
+            'SELECT last_message_id FROM channels WHERE channel_id = ?', (channel_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def set_checkpoint(self, channel_id, channel_name, message_id):
+        """Advance the channel checkpoint (never moves it backwards)"""
+        with self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO channels (channel_id, channel_name, last_message_id, updated_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(channel_id) DO UPDATE SET
+                    channel_name = excluded.channel_name,
+                    last_message_id = MAX(last_message_id, excluded.last_message_id),
+                    updated_at = excluded.updated_at
+                """,
+                (channel_id, channel_name, message_id, datetime.now().isoformat(timespec='seconds'))
+            )
+
+    def get_channel_entity(self, name):
+        """Return (channel_id, access_hash, title) resolved for a configured channel name, or None"""
+        return self.conn.execute(
+            'SELECT channel_id, access_hash, title FROM channel_entities WHERE name = ?', (name,)
+        ).fetchone()
+
+    def set_channel_entity(self, name, channel_id, access_hash, title):
+        """Remember how a channel name resolved, so later runs skip the lookup"""
+        with self.conn:
+            self.conn.execute(
+                """
+                INSERT OR REPLACE INTO channel_entities (name, channel_id, access_hash, title, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (name, channel_id, access_hash, title, datetime.now().isoformat(timespec='seconds'))
+            )
+
+    def forget_channel_entity(self, name):
+        """Drop a cached resolution that stopped working"""
+        with self.conn:
+            self.conn.execute('DELETE FROM channel_entities WHERE name = ?', (name,))
+
+    def get_document(self, channel_id, message_id):
+        """Return the recorded outcome for a message as a dict, or None"""
+        cursor = self.conn.execute(
+            'SELECT * FROM documents WHERE channel_id = ? AND message_id = ?',
+            (channel_id, message_id)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([column[0] for column in cursor.description], row))
+
+    def find_local_copy(self, document_id, size):
+        """Return the path of an intact local copy of a Telegram document, or None"""
+        rows = self.conn.execute(
+            """
+            SELECT file_path FROM documents
+            WHERE document_id = ? AND size = ? AND file_path IS NOT NULL
+              AND status IN ('downloaded', 'existing', 'linked')
+            ORDER BY updated_at DESC
+            """,
+            (document_id, size)
+        ).fetchall()
+        for (file_path,) in rows:
+            try:
+                if os.path.getsize(file_path) == size:
+                    return file_path
+            except OSError:
+                continue
+        return None
+
+    def document_at(self, file_path):
+        """Return the id of the document last saved at file_path, or None"""
+        row = self.conn.execute(
+            """
+            SELECT document_id FROM documents
+            WHERE file_path = ? AND status IN ('downloaded', 'existing', 'linked')
+            ORDER BY updated_at DESC, rowid DESC LIMIT 1
+            """,
+            (str(file_path),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def record_document(self, channel_id, message_id, document_id, size, filename, file_path, status):
+        """Record the outcome ('downloaded', 'existing', 'linked', 'duplicate' or 'failed') of a message
+
+        Returns how many times in a row the message has failed (0 unless status is 'failed').
+        """
+        failed = 1 if status == 'failed' else 0
+        with self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO documents
+                    (channel_id, message_id, document_id, size, filename, file_path, status, updated_at,
+                     failed_attempts)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(channel_id, message_id) DO UPDATE SET
+                    document_id = excluded.document_id,
+                    size = excluded.size,
+                    filename = excluded.filename,
+                    file_path = excluded.file_path,
+                    status = excluded.status,
+                    updated_at = excluded.updated_at,
+                    failed_attempts = CASE WHEN excluded.failed_attempts > 0
+                                           THEN failed_attempts + 1 ELSE 0 END
+                """,
+                (channel_id, message_id, document_id, size, filename,
+                 str(file_path) if file_path else None, status,
+                 datetime.now().isoformat(timespec='seconds'), failed)
+            )
+        if not failed:
+            return 0
+        return self.conn.execute(
+            'SELECT failed_attempts FROM documents WHERE channel_id = ? AND message_id = ?',
+            (channel_id, message_id)
+        ).fetchone()[0]
+
+    def record_import(self, channel_id, message_id, imported, present=False):
+        """Record whether the Calibre import of a message succeeded (or was not needed)"""
+        status = 'present' if present else 'imported' if imported else 'failed'
+        with self.conn:
+            self.conn.execute(
+                'UPDATE documents SET import_status = ?, updated_at = ? WHERE channel_id = ? AND message_id = ?',
+                (status, datetime.now().isoformat(timespec='seconds'), channel_id, message_id)
+            )
@@ -0,0 +1,101 @@
+import sqlite3
+from datetime import date
+
+import pytest
+
+from calibre_db_writer import CalibreLibraryWriter, create_library, title_sort
+
+
+@pytest.fixture
+def library(tmp_path):
+    return create_library(tmp_path / 'library')
+
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    def make(name, content=b'%PDF-1.4\n'):
+        path = tmp_path / 'source' / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+        return path
+    return make
+
+
+def query(library, sql, *params):
+    conn = sqlite3.connect(str(library / 'metadata.db'))
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def test_add_books_writes_rows_and_files(library, make_pdf):
+    source = make_pdf('Mag 2024-01-05.pdf', b'%PDF-1.4\nissue one')
+    results = CalibreLibraryWriter(library).add_books([
+        {'path': source, 'title': 'The Weekly Mag', 'series': 'Mag', 'pubdate': date(2024, 1, 5)},
+    ])
+
+    assert results == [{'status': 'added', 'book_id': 1}]
+    [(title, sort, path, pubdate)] = query(library, 'SELECT title, sort, path, pubdate FROM books')
+    assert (title, sort) == ('The Weekly Mag', title_sort('The Weekly Mag'))
+    assert pubdate.startswith('2024-01-05')
+    assert query(library, 'SELECT series.name FROM books_series_link JOIN series ON series.id = series') == [('Mag',)]
+    assert query(library, 'SELECT format, name FROM data') == [('PDF', 'The Weekly Mag - Unknown')]
+
+    # Calibre's layout: Unknown/<Title> (<id>)/<Title> - Unknown.pdf
+    assert path == 'Unknown/The Weekly Mag (1)'
+    target = library / 'Unknown' / 'The Weekly Mag (1)' / 'The Weekly Mag - Unknown.pdf'
+    assert target.read_bytes() == b'%PDF-1.4\nissue one'
+    assert not list(target.parent.glob('.*.tmp'))
+
+
+def test_duplicate_title_is_skipped(library, make_pdf):
+    writer = CalibreLibraryWriter(library)
+    writer.add_books([{'path': make_pdf('a.pdf'), 'title': 'Mag 2024-01', 'series': None, 'pubdate': None}])
+
+    results = writer.add_books([
+        {'path': make_pdf('b.pdf'), 'title': 'mag 2024-01', 'series': None, 'pubdate': None},
+    ])
+
+    assert results == [{'status': 'duplicate'}]
+    assert query(library, 'SELECT COUNT(*) FROM books') == [(1,)]
+
+
+def test_failed_book_is_rolled_back_without_losing_the_batch(library, make_pdf):
+    results = CalibreLibraryWriter(library).add_books([
+        {'path': make_pdf('first.pdf'), 'title': 'First', 'series': 'Mag', 'pubdate': None},
+        {'path': library.parent / 'missing.pdf', 'title': 'Broken', 'series': 'Other', 'pubdate': None},
+        {'path': make_pdf('third.pdf'), 'title': 'Third', 'series': None, 'pubdate': None},
+    ])
+
+    assert [result['status'] for result in results] == ['added', 'error', 'added']
+    assert query(library, 'SELECT title FROM books ORDER BY id') == [('First',), ('Third',)]
+    # Nothing of the failed book is left behind
+    assert query(library, 'SELECT name FROM series') == [('Mag',)]
+    assert query(library, 'SELECT COUNT(*) FROM books_authors_link') == [(2,)]
+    assert not list((library / 'Unknown').glob('Broken*'))
+
+
+def test_remove_books_deletes_rows_and_folders(library, make_pdf):
+    writer = CalibreLibraryWriter(library)
+    results = writer.add_books([
+        {'path': make_pdf('a.pdf'), 'title': 'Keep', 'series': 'Mag', 'pubdate': None},
+        {'path': make_pdf('b.pdf'), 'title': 'Drop', 'series': 'Mag', 'pubdate': None},
+    ])
+    drop_id = results[1]['book_id']
+
+    assert writer.remove_books([drop_id, 999]) == 1
+
+    assert query(library, 'SELECT title FROM books') == [('Keep',)]
+    for table in ('books_authors_link', 'books_series_link', 'data', 'metadata_dirtied'):
+        assert query(library, f'SELECT COUNT(*) FROM {table} WHERE book = ?', drop_id) == [(0,)]
+    assert not (library / 'Unknown' / f'Drop ({drop_id})').exists()
+    assert (library / 'Unknown').is_dir()  # Still holds the other book
+
+    writer.remove_books([results[0]['book_id']])
+    assert not (library / 'Unknown').exists()
+
+
+def test_add_books_needs_a_library(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        CalibreLibraryWriter(tmp_path / 'nowhere').add_books([])
@@ -0,0 +1,49 @@
+import pytest
+
+from sync_ledger import SyncLedger
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = SyncLedger(tmp_path / 'sync_ledger.db')
+    yield ledger
+    ledger.close()
+
+
+def write(path, size):
+    path.write_bytes(b'x' * size)
+    return path
+
+
+def test_find_local_copy_across_channels(ledger, tmp_path):
+    copy = write(tmp_path / 'a.pdf', 4)
+    ledger.record_document(1, 10, 500, 4, 'a.pdf', copy, 'downloaded')
+
+    assert ledger.find_local_copy(500, 4) == str(copy)
+    assert ledger.find_local_copy(500, 5) is None  # Same id, different size
+    assert ledger.find_local_copy(501, 4) is None
+
+
+@pytest.mark.parametrize('status', ['downloaded', 'existing', 'linked'])
+def test_intact_copies_are_reused(ledger, tmp_path, status):
+    copy = write(tmp_path / 'a.pdf', 4)
+    ledger.record_document(2, 10, 500, 4, 'a.pdf', copy, status)
+
+    assert ledger.find_local_copy(500, 4) == str(copy)
+
+
+@pytest.mark.parametrize('status', ['failed', 'duplicate'])
+def test_failed_and_skipped_records_are_not_copies(ledger, tmp_path, status):
+    ledger.record_document(1, 10, 500, 4, 'a.pdf', write(tmp_path / 'a.pdf', 4), status)
+
+    assert ledger.find_local_copy(500, 4) is None
+
+
+def test_missing_or_truncated_files_are_skipped(ledger, tmp_path):
+    ledger.record_document(1, 10, 500, 4, 'gone.pdf', tmp_path / 'gone.pdf', 'downloaded')
+    ledger.record_document(1, 11, 500, 4, 'short.pdf', write(tmp_path / 'short.pdf', 2), 'downloaded')
+    assert ledger.find_local_copy(500, 4) is None
+
+    intact = write(tmp_path / 'intact.pdf', 4)
+    ledger.record_document(2, 12, 500, 4, 'intact.pdf', intact, 'linked')
+    assert ledger.find_local_copy(500, 4) == str(intact)
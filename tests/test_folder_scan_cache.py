@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+from folder_importer import PDFFolderImporter
+from folder_scan_cache import FolderScanCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = FolderScanCache(tmp_path / 'folder_scan_cache.db')
+    yield cache
+    cache.close()
+
+
+def test_done_only_while_size_and_mtime_match(cache, tmp_path):
+    pdf = tmp_path / 'Mag 2024-01.pdf'
+    cache.record(pdf, 100, 5, 'imported')
+
+    assert cache.is_done(pdf, 100, 5)
+    assert not cache.is_done(pdf, 101, 5)
+    assert not cache.is_done(pdf, 100, 6)
+
+
+def test_failed_or_skipped_files_are_not_done(cache, tmp_path):
+    failed, skipped = tmp_path / 'failed.pdf', tmp_path / 'skipped.pdf'
+    cache.record(failed, 1, 1, 'failed')
+    cache.record(skipped, 1, 1, 'skipped')
+
+    assert not cache.is_done(failed, 1, 1)
+    assert not cache.is_done(skipped, 1, 1)
+
+
+def test_later_outcome_replaces_earlier_one(cache, tmp_path):
+    pdf = tmp_path / 'a.pdf'
+    cache.record(pdf, 1, 1, 'imported')
+    cache.record(pdf, 2, 2, 'failed')
+
+    assert not cache.is_done(pdf, 1, 1)
+    assert not cache.is_done(pdf, 2, 2)
+
+
+def test_outcomes_survive_reopening(tmp_path):
+    path = tmp_path / 'folder_scan_cache.db'
+    pdf = tmp_path / 'a.pdf'
+    cache = FolderScanCache(path)
+    cache.record(pdf, 10, 20, 'present')
+    cache.record(tmp_path / 'b.pdf', 10, 20, 'failed')
+    cache.close()
+
+    reopened = FolderScanCache(path)
+    try:
+        assert reopened.is_done(pdf, 10, 20)
+        assert list(reopened.done) == [os.path.abspath(pdf)]
+    finally:
+        reopened.close()
+
+
+def test_relative_and_absolute_paths_match(cache, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cache.record('a.pdf', 1, 1, 'imported')
+
+    assert cache.is_done(tmp_path / 'a.pdf', 1, 1)
+
+
+def test_scan_does_not_follow_symlinked_folders(tmp_path):
+    source = tmp_path / 'source'
+    (source / 'b').mkdir(parents=True)
+    (source / 'a.pdf').write_bytes(b'%PDF')
+    (source / 'b' / 'c.pdf').write_bytes(b'%PDF-1.4')
+    (source / 'notes.txt').write_text('x')
+    os.symlink(source, source / 'b' / 'loop')
+
+    found = list(PDFFolderImporter()._scan_folder(source, recursive=True))
+
+    assert [(path.relative_to(source).as_posix(), size) for path, size, _ in found] == [('a.pdf', 4), ('b/c.pdf', 8)]
@@ -0,0 +1,62 @@
+import queue
+import threading
+import time
+
+from folder_watcher import FolderWatcher
+
+
+def watch(folder, **kwargs):
+    """A polling FolderWatcher whose batches arrive on a queue (the generator never ends)"""
+    watcher = FolderWatcher(folder, use_inotify=False, poll_seconds=0.05, **kwargs)
+    batches = queue.Queue()
+
+    def run():
+        for batch in watcher.batches():
+            batches.put(batch)
+
+    threading.Thread(target=run, daemon=True).start()
+    return watcher, batches
+
+
+def test_partly_written_file_waits_until_it_settles(tmp_path):
+    watcher, batches = watch(tmp_path, settle_seconds=0.3, batch_seconds=5)
+    path = tmp_path / 'issue.pdf'
+    with open(path, 'wb') as f:
+        for _ in range(6):
+            f.write(b'x' * 1024)
+            f.flush()
+            written_at = time.monotonic()
+            time.sleep(0.1)
+            assert batches.empty()
+
+    batch = batches.get(timeout=5)
+    assert time.monotonic() - written_at >= 0.3
+    assert [(p, size) for p, size, _ in batch] == [(path, 6 * 1024)]
+    watcher.close()
+
+
+def test_burst_is_handed_over_as_one_batch(tmp_path):
+    watcher, batches = watch(tmp_path, settle_seconds=0.2, batch_seconds=5)
+    paths = []
+    for i in range(5):
+        # Later files arrive after the first ones have already settled
+        paths.append(tmp_path / f'issue-{i}.pdf')
+        paths[-1].write_bytes(b'%PDF' * 10)
+        time.sleep(0.08)
+    (tmp_path / 'notes.txt').write_text('not a pdf')
+
+    batch = batches.get(timeout=5)
+    assert sorted(p for p, _, _ in batch) == paths
+    time.sleep(0.5)
+    assert batches.empty()
+    watcher.close()
+
+
+def test_files_present_at_start_are_left_to_the_folder_scan(tmp_path):
+    (tmp_path / 'old.pdf').write_bytes(b'%PDF')
+    watcher, batches = watch(tmp_path, settle_seconds=0.1, batch_seconds=5)
+    (tmp_path / 'new.pdf').write_bytes(b'%PDF')
+
+    batch = batches.get(timeout=5)
+    assert [p.name for p, _, _ in batch] == ['new.pdf']
+    watcher.close()
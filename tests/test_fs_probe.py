@@ -0,0 +1,55 @@
+import pytest
+
+import fs_probe
+
+
+@pytest.mark.parametrize('fs_type, is_network', [
+    ('nfs4', True),
+    ('cifs', True),
+    ('smbfs', True),
+    ('fuse.sshfs', True),
+    ('fuse.rclone', True),
+    ('fuse.gvfsd-fuse', True),
+    ('ext4', False),
+    ('btrfs', False),
+    ('fuseblk', False),
+    ('fuse.mergerfs', False),
+    ('fuse.unionfs', False),
+    ('fuse.ntfs-3g', False),
+])
+def test_network_types(fs_type, is_network):
+    assert fs_probe._is_network_type(fs_type) is is_network
+
+
+def test_longest_mount_point_wins(monkeypatch):
+    monkeypatch.setattr(fs_probe, '_mounts', [('/', 'ext4'), ('/srv/pool', 'fuse.mergerfs'), ('/srv/pool/nas', 'nfs')])
+
+    pool = fs_probe._probe('/srv/pool/books')
+    assert (pool.mount_point, pool.fs_type, pool.is_network) == ('/srv/pool', 'fuse.mergerfs', False)
+    nas = fs_probe._probe('/srv/pool/nas/calibre')
+    assert (nas.mount_point, nas.is_network, nas.reliable_locks) == ('/srv/pool/nas', True, False)
+    assert fs_probe._probe('/srv/poolside').mount_point == '/'
+
+
+def test_path_guess_without_a_mount_table(monkeypatch):
+    monkeypatch.setattr(fs_probe, '_mounts', [])
+
+    assert fs_probe._probe('/mnt/nas/books').is_network
+    assert not fs_probe._probe('/home/me/books').is_network
+
+
+def test_mountinfo_escapes():
+    assert fs_probe._unescape('/mnt/My\\040Books') == '/mnt/My Books'
+
+
+def test_direct_backend_needs_reliable_locks(monkeypatch, tmp_path):
+    import calibre_batch
+
+    def fake_probe(path):
+        is_network = 'nas' in str(path)
+        return fs_probe.FilesystemInfo(str(path), '/', 'nfs4' if is_network else 'ext4', is_network, not is_network)
+
+    monkeypatch.setattr(calibre_batch, 'probe_filesystem', fake_probe)
+    local = calibre_batch.CalibreBatchImporter('calibredb', tmp_path / 'local', backend='direct')
+    nas = calibre_batch.CalibreBatchImporter('calibredb', tmp_path / 'nas', backend='direct')
+    assert (local.backend, nas.backend) == ('direct', 'calibredb')
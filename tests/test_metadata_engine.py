@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+from benchmarks.metadata_extraction import TODAY, build_filenames, build_mapping, reference_extract
+from metadata_engine import MetadataExtractor
+
+# Keys overlap on purpose: the first key in mapping order that the name contains wins
+MAPPING = {
+    'Times': 'The Times',
+    'Sunday Times': 'The Sunday Times',
+    'Economist': 'The Economist',
+    'eco': 'Eco Living',
+    'Auto Express': 'Auto Express',
+    'Ärzte Zeitung': 'Ärzte Zeitung',
+}
+
+FILENAMES = [
+    'The Sunday Times 2024-03-10.pdf',
+    'the economist_2023_11_04.pdf',
+    'ECONOMIST 04-11-2023.pdf',
+    'Auto Express 2024-02.pdf',
+    'Auto Express_2024_02.pdf',
+    'ärzte zeitung 2022.pdf',
+    'Unmapped Magazine 2021-07-15.pdf',
+    'Unmapped - 2021-07-15.pdf',
+    'Scan-2024-13-45 12.pdf',  # Not a valid full date; the year-month and year patterns are tried next
+    'Issue 31-02-2020.pdf',  # No 31st of February either
+    'report_document.pdf',
+    'report_DOC.pdf',
+    'untitled 12.pdf',
+    '2024-05-01.pdf',  # Nothing before the date to use as series
+    'archive.tar.pdf',
+    'Eco.pdf',
+]
+
+
+@pytest.mark.parametrize('filename', FILENAMES)
+def test_same_result_as_the_original_extraction(filename):
+    extractor = MetadataExtractor(MAPPING)
+    assert extractor.extract(filename, default_date=TODAY) == reference_extract(filename, MAPPING)
+
+
+@pytest.mark.parametrize('mapping', [
+    {},
+    {'': 'Catch-all', 'Times': 'The Times'},
+    {'Times': 'The Times', '': 'Catch-all'},
+])
+def test_empty_and_missing_mappings(mapping):
+    extractor = MetadataExtractor(mapping)
+    for filename in FILENAMES:
+        assert extractor.extract(filename, default_date=TODAY) == reference_extract(filename, mapping)
+
+
+def test_same_results_on_generated_filenames():
+    rng = random.Random(7)
+    mapping = build_mapping(500, rng)
+    filenames = build_filenames(2000, mapping, rng)
+
+    expected = [reference_extract(filename, mapping) for filename in filenames]
+    assert MetadataExtractor(mapping).extract_many(filenames, default_date=TODAY) == expected
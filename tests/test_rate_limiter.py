@@ -0,0 +1,91 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import rate_limiter
+from rate_limiter import AdaptiveRateLimiter
+
+
+class FakeClock:
+    """Stands in for time.monotonic() so recovery windows pass instantly"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, 'time', SimpleNamespace(monotonic=clock, sleep=time.sleep))
+    return clock
+
+
+def test_back_off_halves_the_rate_down_to_the_floor(clock):
+    limiter = AdaptiveRateLimiter(8, min_rate=1.5)
+
+    limiter.back_off()
+    assert limiter.rate == 4
+    limiter.back_off()
+    limiter.back_off()
+    assert limiter.rate == 1.5
+    assert limiter.back_offs == 3
+
+
+def test_success_recovers_up_to_the_cap(clock):
+    limiter = AdaptiveRateLimiter(10, max_rate=12, recover_seconds=30)
+    limiter.back_off()
+    assert limiter.rate == 5
+
+    limiter.success()
+    assert limiter.rate == 5  # Still inside the recovery window
+
+    clock.now += 31
+    limiter.success()
+    assert limiter.rate == 5.5  # A twentieth of the starting rate per success
+    for _ in range(100):
+        limiter.success()
+    assert limiter.rate == 12
+
+
+def test_tokens_pace_requests_beyond_the_burst(clock):
+    limiter = AdaptiveRateLimiter(2, burst=2)
+
+    assert limiter._reserve() == 0
+    assert limiter._reserve() == 0
+    assert limiter._reserve() == pytest.approx(0.5)
+    clock.now += 10
+    assert limiter._reserve() == 0
+
+
+def test_flood_wait_pause_blocks_acquire():
+    limiter = AdaptiveRateLimiter(100)
+    limiter.back_off(0.3)
+
+    async def timed(wait):
+        start = time.monotonic()
+        await wait()
+        return time.monotonic() - start
+
+    loop = asyncio.new_event_loop()
+    try:
+        assert loop.run_until_complete(timed(limiter.acquire)) >= 0.25
+        limiter.back_off(0.2)
+        assert loop.run_until_complete(timed(limiter.paused)) >= 0.15
+        assert loop.run_until_complete(timed(limiter.paused)) < 0.05  # Pause is over
+    finally:
+        loop.close()
+    assert limiter.waited_seconds >= 0.4
+
+
+def test_pause_blocks_threads_too():
+    limiter = AdaptiveRateLimiter(100)
+    limiter.back_off(0.2)
+
+    start = time.monotonic()
+    limiter.wait()
+    assert time.monotonic() - start >= 0.15
@@ -0,0 +1,115 @@
+import sqlite3
+
+import pytest
+
+from sync_ledger import SyncLedger
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = SyncLedger(tmp_path / 'sync_ledger.db')
+    yield ledger
+    ledger.close()
+
+
+def test_checkpoint_starts_at_zero(ledger):
+    assert ledger.get_checkpoint(1) == 0
+
+
+def test_checkpoint_never_moves_backwards(ledger):
+    ledger.set_checkpoint(1, 'mags', 50)
+    ledger.set_checkpoint(1, 'mags', 20)
+    assert ledger.get_checkpoint(1) == 50
+
+    ledger.set_checkpoint(1, 'mags', 80)
+    assert ledger.get_checkpoint(1) == 80
+    assert ledger.get_checkpoint(2) == 0
+
+
+def test_checkpoint_survives_reopening(tmp_path):
+    path = tmp_path / 'sync_ledger.db'
+    ledger = SyncLedger(path)
+    ledger.set_checkpoint(1, 'mags', 42)
+    ledger.close()
+
+    reopened = SyncLedger(path)
+    try:
+        assert reopened.get_checkpoint(1) == 42
+    finally:
+        reopened.close()
+
+
+def test_record_document_upserts(ledger, tmp_path):
+    ledger.record_document(1, 10, 500, 3, 'a.pdf', None, 'failed')
+    ledger.record_document(1, 10, 500, 3, 'a.pdf', tmp_path / 'a.pdf', 'downloaded')
+    ledger.record_import(1, 10, True)
+
+    document = ledger.get_document(1, 10)
+    assert document['status'] == 'downloaded'
+    assert document['file_path'] == str(tmp_path / 'a.pdf')
+    assert document['import_status'] == 'imported'
+    assert ledger.get_document(1, 11) is None
+    assert ledger.conn.execute('SELECT COUNT(*) FROM documents').fetchone() == (1,)
+
+
+def test_record_import_keeps_books_already_present_apart(ledger, tmp_path):
+    ledger.record_document(1, 10, 500, 3, 'a.pdf', tmp_path / 'a.pdf', 'downloaded')
+    ledger.record_import(1, 10, True, present=True)
+    assert ledger.get_document(1, 10)['import_status'] == 'present'
+
+    ledger.record_import(1, 10, False)
+    assert ledger.get_document(1, 10)['import_status'] == 'failed'
+
+
+def test_channel_entity_cache(ledger):
+    ledger.set_channel_entity('mags', 1, 99, 'Mags')
+    assert ledger.get_channel_entity('mags') == (1, 99, 'Mags')
+
+    ledger.forget_channel_entity('mags')
+    assert ledger.get_channel_entity('mags') is None
+
+
+def test_failed_attempts_count_up_and_reset_on_success(ledger):
+    assert ledger.record_document(1, 10, 500, 3, None, None, 'failed') == 1
+    assert ledger.record_document(1, 10, 500, 3, None, None, 'failed') == 2
+    assert ledger.record_document(1, 11, 501, 3, None, None, 'failed') == 1
+
+    assert ledger.record_document(1, 10, 500, 3, 'a.pdf', 'a.pdf', 'downloaded') == 0
+    assert ledger.get_document(1, 10)['failed_attempts'] == 0
+    assert ledger.record_document(1, 10, 500, 3, None, None, 'failed') == 1
+
+
+def test_older_ledgers_gain_the_failed_attempts_column(tmp_path):
+    path = tmp_path / 'sync_ledger.db'
+    conn = sqlite3.connect(str(path))
+    conn.execute(
+        """
+        CREATE TABLE documents (
+            channel_id INTEGER NOT NULL, message_id INTEGER NOT NULL, document_id INTEGER, size INTEGER,
+            filename TEXT, file_path TEXT, status TEXT NOT NULL, import_status TEXT, updated_at TEXT,
+            PRIMARY KEY (channel_id, message_id)
+        )
+        """
+    )
+    conn.execute("INSERT INTO documents (channel_id, message_id, status) VALUES (1, 10, 'failed')")
+    conn.commit()
+    conn.close()
+
+    ledger = SyncLedger(path)
+    try:
+        assert ledger.get_document(1, 10)['failed_attempts'] == 0
+        assert ledger.record_document(1, 10, 500, 3, None, None, 'failed') == 1
+    finally:
+        ledger.close()
+
+
+def test_document_at_returns_the_latest_owner_of_a_path(ledger, tmp_path):
+    path = tmp_path / 'The Economist.pdf'
+    assert ledger.document_at(path) is None
+
+    ledger.record_document(1, 10, 500, 3, 'The Economist.pdf', path, 'downloaded')
+    ledger.record_document(1, 11, 501, 3, 'The Economist.pdf', None, 'failed')
+    assert ledger.document_at(path) == 500
+
+    ledger.record_document(1, 12, 502, 3, 'The Economist.pdf', path, 'downloaded')
+    assert ledger.document_at(path) == 502